@@ -0,0 +1,63 @@
+# Compares the app's threaded and async query paths under 10/50/100 simulated users. Every user is a
+# session thread (as in Streamlit) loading one page worth of independent queries through
+# read_sql_many(), which runs them one by one, or with PHONEPE_ASYNC_DB semantics awaits them as a
+# batch on async_runtime()'s loop. Snapshot and shared cache are switched off so every query hits MySQL.
+# Run from the repository root with the PHONEPE_DB_* settings of a loaded database:
+#   python benchmarks/bench_async_queries.py --users 10 50 100
+# The async path keeps at most PHONEPE_ASYNC_MAX_CONCURRENCY queries in flight, as in the app.
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["PHONEPE_SNAPSHOT_DIR"] = ""
+os.environ.pop("PHONEPE_SHARED_CACHE", None)
+
+import phonepe_web_app as app
+
+# Parameterless compiled rollups, so read_sql_many can batch them like main_page's trend queries
+PAGE_QUERIES = [app.compile_query(["registered_users", "appopen_count"], ["year", "quarter"], {})[0],
+                app.compile_query(["transaction_count", "transaction_amount"], ["year", "quarter"], {})[0],
+                app.compile_query(["insurance_count", "insurance_amount"], ["year", "quarter"], {})[0],
+                app.compile_query(["transaction_count", "transaction_amount"], ["state", "year", "quarter", "transaction_type"], {})[0],
+                app.compile_query(["user_count"], ["state", "year", "brand"], {})[0],
+                app.compile_query(["registered_users"], ["state", "district"], {})[0]]
+
+def page():
+    start = time.perf_counter()
+    app.read_sql_many(PAGE_QUERIES, app.read_engine())
+    return time.perf_counter() - start
+
+def run(users, use_async):
+    app.ASYNC_DB = use_async
+    if use_async:
+        app.async_runtime()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        latencies = list(pool.map(lambda _: page(), range(users)))
+    return time.perf_counter() - start, latencies
+
+def report(mode, users, wall, latencies):
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+    print(f"{mode:<9}{users:>6}{wall:>10.2f}{p50:>10.1f}{p95:>10.1f}{users / wall:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 50, 100])
+    args = parser.parse_args()
+    if app.create_async_engine is None:
+        sys.exit("the async path needs sqlalchemy[asyncio] and the PHONEPE_DB_ASYNC_DRIVER driver installed")
+
+    print(f"{'mode':<9}{'users':>6}{'wall s':>10}{'p50 ms':>10}{'p95 ms':>10}{'pages/s':>10}")
+    for users in args.users:
+        report("threaded", users, *run(users, False))
+        report("async", users, *run(users, True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Compares the animated year choropleth against the on-demand single period map.
+# Run from the repository root: python benchmarks/bench_choropleth_payload.py
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phonepe_web_app import geo_choropleth_plot, geo_choropleth_period, value_formats
+
+STATES = pd.read_csv(os.path.join(os.path.dirname(__file__), "..", "CSV Transformed Data", "map_user.csv"))['State'].unique()
+HOVER = "Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Registered Users : %{customdata[2]}<br>Appopen Count : %{customdata[3]}<extra></extra>"
+COLUMNS = ['state', 'year', 'user_counts_f', 'open_counts_f']
+REPEAT = 3
+
+def sample_frame(n_years):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame([(state, 2018 + i) for i in range(n_years) for state in STATES], columns=['state', 'year'])
+    df['user_count'] = rng.integers(1e4, 1e8, len(df))
+    df['open_count'] = rng.integers(1e4, 1e9, len(df))
+    df['user_counts_f'] = df['user_count'].apply(value_formats)
+    df['open_counts_f'] = df['open_count'].apply(value_formats)
+    return df
+
+def animated(df):
+    fig = geo_choropleth_plot(df.copy(), 'state', 'user_count', "", 'year', None, None)
+    for frame in fig.frames:
+        frame_df = df[df['year'] == int(frame.name)]
+        frame.data[0].customdata = frame_df[COLUMNS].values
+        frame.data[0].hovertemplate = HOVER
+    return fig
+
+def on_demand(df):
+    return geo_choropleth_period(df, 'state', 'user_count', 'year', df['year'].max(), COLUMNS, HOVER)
+
+def measure(build, df):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        payload = build(df).to_json()
+        best = min(best, time.perf_counter() - start)
+    return len(payload), best
+
+if __name__ == "__main__":
+    print(f"{'years':>5} {'animated bytes':>15} {'animated ms':>12} {'on-demand bytes':>16} {'on-demand ms':>13}")
+    for n_years in (7, 10, 15, 20):
+        df = sample_frame(n_years)
+        a_size, a_time = measure(animated, df)
+        o_size, o_time = measure(on_demand, df)
+        print(f"{n_years:>5} {a_size:>15,} {a_time*1000:>12.1f} {o_size:>16,} {o_time*1000:>13.1f}")
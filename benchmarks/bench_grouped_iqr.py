@@ -0,0 +1,41 @@
+# Compares per-group get_iqr_bounds style quantiles against grouped_iqr_bounds.
+# Run from the repository root: python benchmarks/bench_grouped_iqr.py
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phonepe_web_app import grouped_iqr_bounds
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "CSV Transformed Data")
+REPEAT = 3
+
+def per_group(df, group_columns, value_column):
+    def bounds(series):
+        s = series.sort_values()
+        q1, q2, q3 = s.quantile(0.25), s.quantile(0.50), s.quantile(0.75)
+        return pd.Series({'q1': q1, 'q2': q2, 'q3': q3, 'lower': q1 - 1.5 * (q3 - q1), 'upper': q3 + 1.5 * (q3 - q1)})
+    return df.groupby(group_columns)[value_column].apply(bounds).unstack()
+
+def measure(build, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = build(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+if __name__ == "__main__":
+    df = pd.read_csv(os.path.join(DATA_DIR, "map_transaction.csv"))
+    df.columns = ['state', 'year', 'quarter', 'district', 'transaction_count', 'transaction_amount']
+    print(f"{'groups':<24} {'n':>6} {'per group ms':>13} {'grouped ms':>11} {'speedup':>8} {'match':>6}")
+    for group_columns in (['year'], ['state'], ['state', 'year'], ['state', 'year', 'quarter']):
+        old, old_time = measure(per_group, df, group_columns, 'transaction_count')
+        new, new_time = measure(grouped_iqr_bounds, df, group_columns, 'transaction_count')
+        match = np.allclose(old[['q1', 'q2', 'q3']].to_numpy(dtype=float), new[['q1', 'q2', 'q3']].to_numpy())
+        print(f"{'/'.join(group_columns):<24} {len(new):>6} {old_time*1000:>13.1f} {new_time*1000:>11.1f} {old_time/new_time:>7.1f}x {str(match):>6}")
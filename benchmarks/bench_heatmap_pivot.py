@@ -0,0 +1,57 @@
+# Compares the triple pivot_table + dstack heatmap build against heatmap_data.
+# Run from the repository root: python benchmarks/bench_heatmap_pivot.py
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phonepe_web_app import heatmap_data, value_formats
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "CSV Transformed Data")
+REPEAT = 5
+
+def load_frames():
+    map_user = pd.read_csv(os.path.join(DATA_DIR, "map_user.csv"))
+    map_user.columns = ['state', 'year', 'quarter', 'district', 'user_count', 'open_count']
+    aggregated_user = pd.read_csv(os.path.join(DATA_DIR, "aggregated_user.csv"))
+    aggregated_user.columns = ['state', 'year', 'quarter', 'brand', 'user_count', 'user_percentage']
+    users = map_user.groupby(['state', 'year'])[['user_count', 'open_count']].sum().reset_index()
+    brands = aggregated_user.groupby(['state', 'year', 'brand'])['user_count'].sum().reset_index()
+    # The app's brand heatmap: one selected brand by state and year, brand as a hover column
+    brand = brands[brands['brand'] == brands.groupby('brand')['user_count'].sum().idxmax()]
+    return {"map_user (state x year)": (users, ['user_count', 'open_count'], []),
+            "brand (state x year)": (brand, ['user_count'], ['brand']),
+            "map_user (raw rows)": (map_user, ['user_count', 'open_count'], ['quarter']),
+            "aggregated_user (raw rows)": (aggregated_user, ['user_count'], ['brand'])}
+
+def triple_pivot(df, measures, extras):
+    df = df.copy()
+    for column in measures:
+        df[column + '_f'] = df[column].apply(value_formats)
+    z = df.pivot_table(index='year', columns='state', values='user_count')
+    layers = [df.pivot_table(index='year', columns='state', values=column + '_f', aggfunc='first').values for column in measures]
+    layers += [df.pivot_table(index='year', columns='state', values=column, aggfunc='first').values for column in extras]
+    return z.columns, z.index, z.values, np.dstack(layers)
+
+def single_pass(df, measures, extras):
+    return heatmap_data(df, 'year', 'state', 'user_count', measures, extras)
+
+def measure(build, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        build(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    print(f"{'frame':<28} {'rows':>8} {'pivot_table ms':>15} {'heatmap_data ms':>16} {'speedup':>8}")
+    for name, (df, measures, extras) in load_frames().items():
+        old = measure(triple_pivot, df, measures, extras)
+        new = measure(single_pass, df, measures, extras)
+        print(f"{name:<28} {len(df):>8,} {old*1000:>15.1f} {new*1000:>16.1f} {old/new:>7.1f}x")
@@ -0,0 +1,71 @@
+# Render cost of the district bubble map against the number of points, drawing every point as a
+# marker versus clustering them per zoom level first (cluster time included). The state outline
+# trace is the same for both and needs india_states.geojson, so it is stubbed out and only the
+# Scattermapbox markers are measured.
+# Run from the repository root: python benchmarks/bench_map_clustering.py --zoom 4 7
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import phonepe_web_app as app
+from phonepe_web_app import cluster_points, district_bubble_figure, value_formats_array
+
+# district_bubble_figure looks the outlines up at call time, an empty collection leaves an empty outline trace
+app.india_state_outlines = lambda: ({"type": "FeatureCollection", "features": []}, [])
+
+CENTER = {"lat": 22.9734, "lon": 78.6569}
+REPEAT = 3
+
+def sample_points(n):
+    # Pincode-like spread: points scattered around a few hundred district centres inside India's bounding box
+    rng = np.random.default_rng(0)
+    centres = np.column_stack([rng.uniform(8, 34, 700), rng.uniform(69, 96, 700)])
+    picked = centres[rng.integers(0, len(centres), n)]
+    df = pd.DataFrame({'state': [f"State {i % 36}" for i in range(n)],
+                       'district': [f"Pincode {i}" for i in range(n)],
+                       'latitude': picked[:, 0] + rng.normal(0, 0.2, n),
+                       'longitude': picked[:, 1] + rng.normal(0, 0.2, n),
+                       'users': rng.integers(1e3, 1e7, n)})
+    df['users_f'] = value_formats_array(df['users'])
+    return df
+
+def every_point(df, zoom):
+    return district_bubble_figure(df, CENTER, zoom)
+
+def clustered(df, zoom):
+    points = cluster_points(df, 'users', zoom, ['state', 'district'])
+    points['users_f'] = value_formats_array(points['users'])
+    return district_bubble_figure(points, CENTER, zoom)
+
+def measure(build, df, zoom):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fig = build(df, zoom)
+        payload = fig.to_json()
+        best = min(best, time.perf_counter() - start)
+    return len(fig.data[1].lat), len(payload), best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, nargs="+", default=[750, 5000, 20000, 50000, 100000])
+    parser.add_argument("--zoom", type=int, nargs="+", default=[4, 7])
+    args = parser.parse_args()
+
+    print(f"{'points':>7} {'zoom':>4} {'markers':>8} {'bytes':>12} {'ms':>8} {'clustered':>10} {'bytes':>10} {'ms':>8}")
+    for n in args.points:
+        df = sample_points(n)
+        for zoom in args.zoom:
+            markers, size, elapsed = measure(every_point, df, zoom)
+            c_markers, c_size, c_elapsed = measure(clustered, df, zoom)
+            print(f"{n:>7} {zoom:>4} {markers:>8,} {size:>12,} {elapsed*1000:>8.1f} {c_markers:>10,} {c_size:>10,} {c_elapsed*1000:>8.1f}")
+
+if __name__ == "__main__":
+    main()
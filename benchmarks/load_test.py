@@ -0,0 +1,153 @@
+# Headless load test: replays sidebar filter combinations on every page with AppTest and reports
+# p50/p95 latency and DB query count per page, failing on regressions against the stored baseline.
+# Run from the repository root: python benchmarks/load_test.py --sessions 4
+# Record a new baseline after an intended change: python benchmarks/load_test.py --update-baseline
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "phonepe_web_app.py")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_test_baseline.json")
+
+def widget(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+def new_session(timeout):
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    at.run()
+    return at
+
+def navigate(at, radios):
+    # Radios are applied in discovery order because each one can reveal the next
+    for label, value in radios:
+        radio = widget(at.sidebar.radio, label)
+        if radio.value != value:
+            radio.set_value(value).run()
+
+def discover_pages(timeout):
+    # Every reachable combination of sidebar radios (page, sub-page, sub-analysis)
+    at = new_session(timeout)
+    pages, pending = [], [[]]
+    while pending:
+        radios = pending.pop()
+        navigate(at, radios)
+        fixed = {label for label, _ in radios}
+        open_radios = [r for r in at.sidebar.radio if r.label not in fixed]
+        if not open_radios:
+            selects = [(s.label, len(s.options)) for s in at.sidebar.selectbox]
+            pages.append((radios, selects))
+            continue
+        pending += [radios + [(open_radios[0].label, option)] for option in open_radios[0].options]
+    return pages
+
+def scenarios(pages, per_page, seed):
+    # state x year x quarter x brand (whichever the page shows), sampled down to per_page combinations
+    rng = random.Random(seed)
+    result = []
+    for radios, selects in pages:
+        combos = list(itertools.product(*[range(n) for _, n in selects]))
+        if per_page and len(combos) > per_page:
+            combos = rng.sample(combos, per_page)
+        labels = [label for label, _ in selects]
+        result += [(radios, list(zip(labels, combo))) for combo in combos]
+    rng.shuffle(result)
+    return result
+
+def page_name(radios):
+    return " / ".join(value for _, value in radios)
+
+def run_session(work, timeout, results, lock):
+    at = new_session(timeout)
+    for radios, selects in work:
+        navigate(at, radios)
+        for label, index in selects:
+            widget(at.sidebar.selectbox, label).select_index(index)
+        before = at.session_state["query_count"] if "query_count" in at.session_state else 0
+        start = time.perf_counter()
+        at.run()
+        elapsed = (time.perf_counter() - start) * 1000
+        queries = at.session_state["query_count"] - before if "query_count" in at.session_state else 0
+        with lock:
+            results.setdefault(page_name(radios), []).append((elapsed, queries, len(at.exception)))
+
+def summarize(results):
+    report = {}
+    for page, runs in sorted(results.items()):
+        latency = np.array([elapsed for elapsed, _, _ in runs])
+        queries = np.array([count for _, count, _ in runs])
+        report[page] = {"runs": len(runs),
+                        "p50_ms": round(float(np.percentile(latency, 50)), 1),
+                        "p95_ms": round(float(np.percentile(latency, 95)), 1),
+                        "max_ms": round(float(latency.max()), 1),
+                        "queries_mean": round(float(queries.mean()), 2),
+                        "queries_max": int(queries.max()),
+                        "errors": sum(errors for _, _, errors in runs)}
+    return report
+
+def regressions(report, baseline, tolerance):
+    failures = []
+    for page, stats in report.items():
+        if stats["errors"]:
+            failures.append(f"{page}: {stats['errors']} script exceptions")
+        base = baseline.get(page)
+        if base is None:
+            continue
+        if stats["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            failures.append(f"{page}: p95 {stats['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if stats["queries_mean"] > base["queries_mean"] * (1 + tolerance):
+            failures.append(f"{page}: {stats['queries_mean']} queries per run vs baseline {base['queries_mean']}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=1, help="concurrent simulated sessions")
+    parser.add_argument("--per-page", type=int, default=25, help="filter combinations per page, 0 for all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--report", help="also write the report as JSON to this path")
+    args = parser.parse_args()
+    # Without a baseline there is nothing to fail against, so only --update-baseline may run without one
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        sys.exit(f"No baseline at {args.baseline}, run with --update-baseline to record one")
+
+    pages = discover_pages(args.timeout)
+    work = scenarios(pages, args.per_page, args.seed)
+    results, lock = {}, threading.Lock()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        jobs = [pool.submit(run_session, work[i::args.sessions], args.timeout, results, lock) for i in range(args.sessions)]
+        for job in jobs:
+            job.result()
+    report = summarize(results)
+
+    print(f"{'page':<60} {'runs':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'queries':>8} {'errors':>7}")
+    for page, stats in report.items():
+        print(f"{page:<60} {stats['runs']:>5} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['max_ms']:>9.1f} "
+              f"{stats['queries_mean']:>8.2f} {stats['errors']:>7}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    else:
+        with open(args.baseline) as f:
+            failures = regressions(report, json.load(f), args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        sys.exit(1 if failures else 0)
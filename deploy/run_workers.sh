@@ -0,0 +1,18 @@
+#!/usr/bin/env sh
+# Starts PHONEPE_WORKERS Streamlit workers on consecutive ports, all sharing one on-disk cache.
+# Put deploy/nginx_phonepe.conf in front of them; its upstream list must match the worker ports.
+set -e
+cd "$(dirname "$0")/.."
+
+WORKERS=${PHONEPE_WORKERS:-$(nproc)}
+BASE_PORT=${PHONEPE_BASE_PORT:-8501}
+export PHONEPE_SHARED_CACHE=${PHONEPE_SHARED_CACHE:-$PWD/.cache/phonepe_cache.sqlite}
+mkdir -p "$(dirname "$PHONEPE_SHARED_CACHE")"
+
+trap 'kill 0' INT TERM
+i=0
+while [ "$i" -lt "$WORKERS" ]; do
+    streamlit run phonepe_web_app.py --server.port $((BASE_PORT + i)) --server.address 127.0.0.1 --server.headless true &
+    i=$((i + 1))
+done
+wait
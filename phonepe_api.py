@@ -0,0 +1,323 @@
+# Read-only HTTP API over the dashboard aggregates, served as JSON or Arrow IPC.
+# Run from the repository root: python phonepe_api.py  (PHONEPE_API_HOST / PHONEPE_API_PORT)
+#
+#   GET /api/version
+#   GET /api/kpis
+#   GET /api/trends?metric=transaction_count
+#   GET /api/brand-shares?state=Karnataka&year=2023
+#   GET /api/leaderboard?metric=registered_users&geo_level=district&year=2024&quarter=All&band=top&n=10
+#   GET /api/insurance-categories
+#   GET /api/export?section=transaction.payment_mode&state=Karnataka&year=2023&format=csv
+#
+# Add ?format=arrow (or Accept: application/vnd.apache.arrow.stream) for an Arrow IPC stream.
+# Responses carry an ETag and Last-Modified bound to the ETL load version, so conditional
+# requests are answered with 304 without touching the database. Exports (csv or parquet) are
+# streamed in keyset chunks of PHONEPE_EXPORT_CHUNK_ROWS (WHERE id > last ORDER BY id) and never cached.
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+import streamlit as st
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from phonepe_web_app import (DATA_CACHE_TTL, EXPORT_SECTIONS, compiled_frame, data_version, execute_query, export_query, kpi_totals,
+                             leaderboard, quarter_list, read_connection, read_engine, read_sql, state_list, state_priority, year_list)
+
+API_HOST = os.environ.get("PHONEPE_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("PHONEPE_API_PORT", 8600))
+RESPONSE_CACHE_SIZE = int(os.environ.get("PHONEPE_API_RESPONSE_CACHE_SIZE", 512))
+EXPORT_CHUNK_ROWS = int(os.environ.get("PHONEPE_EXPORT_CHUNK_ROWS", 20000))
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+EXPORT_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+METRICS = ["registered_users", "transaction_count", "transaction_amount", "insurance_count", "insurance_amount"]
+LEADERBOARD_METRICS = ["registered_users", "transaction_count"]
+GEO_LEVELS = ["state", "district", "pincode"]
+BANDS = ["top", "moderate", "bottom"]
+STARTED = datetime.now(timezone.utc).replace(microsecond=0)
+
+class bad_request(Exception):
+    pass
+
+# Parameter Validation
+
+def choice(params, name, options, default=None):
+    value = params.get(name, default)
+    if value not in options:
+        raise bad_request(f"{name} must be one of {', '.join(str(option) for option in options)}")
+    return value
+
+def period(params, name, options):
+    value = params.get(name, "All")
+    if value == "All":
+        return value
+    if name == "year":
+        if not value.isdigit() or int(value) not in options:
+            raise bad_request(f"year must be All or one of {', '.join(str(option) for option in sorted(options))}")
+        return int(value)
+    return choice(params, name, options)
+
+# Datasets
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
+def state_year_trends(version, metric):
+    query = f"""SELECT state, year, value, yoy_percent FROM growth
+                WHERE metric = '{metric}' AND geo_level = 'state' AND quarter = 'All' ORDER BY state, year;"""
+    return read_sql(query, read_engine())
+
+def brand_shares(version, state, year):
+    df = compiled_frame(["user_count"], ["brand"], {"state": state, "year": year})
+    df = df.sort_values('user_count', ascending=False, ignore_index=True)
+    df['share'] = df['user_count'] / df['user_count'].sum()
+    return df
+
+# Each endpoint is (parse, dataset): parse validates the query parameters into the dataset's arguments
+# before any validator is built, dataset(version, *args) returns the frame
+
+def no_params(params):
+    return ()
+
+def trends_params(params):
+    return (choice(params, "metric", METRICS, "transaction_count"),)
+
+def brand_shares_params(params):
+    state = params.get("state", "All")
+    if state != "All":
+        state = choice(params, "state", state_list())
+    return state, period(params, "year", year_list())
+
+def leaderboard_params(params):
+    n = params.get("n", "10")
+    if not n.isdigit() or not 0 < int(n) <= 1000:
+        raise bad_request("n must be an integer between 1 and 1000")
+    return (choice(params, "metric", LEADERBOARD_METRICS, "transaction_count"),
+            choice(params, "geo_level", GEO_LEVELS, "state"),
+            period(params, "year", year_list()),
+            period(params, "quarter", quarter_list()),
+            choice(params, "band", BANDS, "top"),
+            int(n),
+            params.get("by_period", "0") == "1")
+
+def version_dataset(version):
+    return pd.DataFrame([{"load_version": version, "loaded_at": load_time(version).isoformat()}])
+
+def kpis_dataset(version):
+    return kpi_totals(version)
+
+def trends_dataset(version, metric):
+    return state_year_trends(version, metric)
+
+def brand_shares_dataset(version, state, year):
+    return brand_shares(version, state, year)
+
+def leaderboard_dataset(version, metric, geo_level, year, quarter, band, n, by_period):
+    return leaderboard(metric, geo_level, year, quarter, band, n, 'value', by_period)
+
+def insurance_categories_dataset(version):
+    return state_priority(version)
+
+DATASETS = {"/api/version": (no_params, version_dataset),
+            "/api/kpis": (no_params, kpis_dataset),
+            "/api/trends": (trends_params, trends_dataset),
+            "/api/brand-shares": (brand_shares_params, brand_shares_dataset),
+            "/api/leaderboard": (leaderboard_params, leaderboard_dataset),
+            "/api/insurance-categories": (no_params, insurance_categories_dataset)}
+
+# Responses
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
+def load_time(version):
+    # Last-Modified of a version is when the ETL recorded it
+    if not version:
+        return STARTED
+    query = f"SELECT loaded_at FROM load_metadata WHERE load_version = {version};"
+    df = read_sql(query, read_engine())
+    if df.empty or df.iloc[0, 0] is None:
+        return STARTED
+    return df.iloc[0, 0].to_pydatetime().replace(tzinfo=timezone.utc)
+
+response_cache = {"lock": threading.Lock(), "entries": OrderedDict()}
+
+def render(path, args, fmt, version):
+    key = (version, path, args, fmt)
+    with response_cache["lock"]:
+        body = response_cache["entries"].get(key)
+        if body is not None:
+            response_cache["entries"].move_to_end(key)
+            return body
+
+    df = DATASETS[path][1](version, *args)
+    if fmt == "arrow":
+        sink = io.BytesIO()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        body = sink.getvalue()
+    else:
+        body = df.to_json(orient="records", date_format="iso").encode()
+
+    with response_cache["lock"]:
+        response_cache["entries"][key] = body
+        while len(response_cache["entries"]) > RESPONSE_CACHE_SIZE:
+            response_cache["entries"].popitem(last=False)
+    return body
+
+# Exports
+
+def export_filters(params, section):
+    filter_columns = EXPORT_SECTIONS[section][2]
+    unknown = set(params) - set(filter_columns)
+    if unknown:
+        raise bad_request(f"{section} can be filtered on {', '.join(filter_columns)}")
+    filters = dict(params)
+    if "state" in filters:
+        filters["state"] = choice(params, "state", state_list())
+    if "year" in filters:
+        filters["year"] = period(params, "year", year_list())
+    if "quarter" in filters:
+        filters["quarter"] = period(params, "quarter", quarter_list())
+    return filters
+
+def export_chunks(query, params):
+    # mysqlconnector buffers whole results (no server-side cursors), so each chunk is its own
+    # LIMIT query resuming after the last id sent and memory stays at one chunk
+    after = 0
+    with read_connection() as conn:
+        while True:
+            chunk = execute_query(query, conn, ("api", "export_chunks"), {**params, "after": after, "size": EXPORT_CHUNK_ROWS})
+            if chunk.empty:
+                return
+            after = int(chunk["id"].iloc[-1])
+            yield chunk.drop(columns="id")
+            if len(chunk) < EXPORT_CHUNK_ROWS:
+                return
+
+def write_export(sink, query, params, fmt):
+    if fmt == "csv":
+        header = True
+        for chunk in export_chunks(query, params):
+            sink.write(chunk.to_csv(index=False, header=header).encode())
+            header = False
+        return
+    writer = None
+    try:
+        for chunk in export_chunks(query, params):
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+class aggregates_handler(BaseHTTPRequestHandler):
+    server_version = "PhonepeAggregates/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        if url.path == "/api/export":
+            return self.send_export(params)
+        if url.path not in DATASETS:
+            return self.send_error_json(404, f"unknown endpoint {url.path}")
+
+        fmt = params.pop("format", "arrow" if ARROW_TYPE in self.headers.get("Accept", "") else "json")
+        if fmt not in ("json", "arrow"):
+            return self.send_error_json(400, "format must be json or arrow")
+        if fmt == "arrow" and pa is None:
+            return self.send_error_json(406, "Arrow output needs pyarrow installed")
+
+        # Parameters are checked first, so an invalid request never gets a validator or a 304
+        parse, _ = DATASETS[url.path]
+        try:
+            args = parse(params)
+        except bad_request as e:
+            return self.send_error_json(400, str(e))
+
+        # Validators depend only on the polled load version and the parsed arguments, so a 304
+        # costs no dataset query
+        version = data_version()
+        etag = '"' + hashlib.sha1(repr((version, url.path, args, fmt)).encode()).hexdigest()[:20] + '"'
+        last_modified = load_time(version)
+        if self.not_modified(etag, last_modified, lambda: render(url.path, args, fmt, version) is not None):
+            self.send_response(304)
+            self.send_validators(etag, last_modified)
+            self.end_headers()
+            return
+
+        body = render(url.path, args, fmt, version)
+
+        self.send_response(200)
+        self.send_header("Content-Type", ARROW_TYPE if fmt == "arrow" else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_validators(etag, last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_export(self, params):
+        try:
+            section = choice(params, "section", list(EXPORT_SECTIONS))
+            fmt = choice(params, "format", list(EXPORT_TYPES), "csv")
+            filters = export_filters({k: v for k, v in params.items() if k not in ("section", "format")}, section)
+        except bad_request as e:
+            return self.send_error_json(400, str(e))
+        if fmt == "parquet" and pa is None:
+            return self.send_error_json(406, "Parquet export needs pyarrow installed")
+
+        # Size is unknown up front: the body runs until the connection closes
+        filename = re.sub(r"[^A-Za-z0-9_-]+", "-", "_".join([section.replace(".", "_")] + [str(value) for value in filters.values()]))
+        self.send_response(200)
+        self.send_header("Content-Type", EXPORT_TYPES[fmt])
+        self.send_header("Content-Disposition", f'attachment; filename="{filename}.{fmt}"')
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        write_export(self.wfile, *export_query(section, filters), fmt)
+
+    def not_modified(self, etag, last_modified, exists):
+        # exists() renders the representation; "*" only matches once there is one
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return exists()
+            return etag in [tag.strip() for tag in if_none_match.split(",")]
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_validators(self, etag, last_modified):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", format_datetime(last_modified, usegmt=True))
+        self.send_header("Cache-Control", "no-cache")
+
+    def send_error_json(self, status, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer((API_HOST, API_PORT), aggregates_handler)
+    print(f"Serving PhonePe Pulse aggregates on http://{API_HOST}:{API_PORT}/api/")
+    server.serve_forever()
@@ -1,4 +1,5 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 import pandas as pd
 import numpy as np
@@ -6,6 +7,8 @@ import numpy as np
 import mysql.connector as msql
 from mysql.connector import Error
 from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
 
 import geopandas as gpd
 import matplotlib.pyplot as plt
@@ -13,58 +16,793 @@ import plotly.express as px
 import plotly.graph_objects as go
 import seaborn as sns
 
+import asyncio
 import json
+import os
 import requests
 
+import hashlib
+import logging
+import math
+import pickle
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
 import warnings
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+import plotly.io as pio
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import connectorx as cx
+except ImportError:
+    cx = None
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine
+except ImportError:
+    create_async_engine = None
 
 # Database Connection Setup
 
-DB_USER = 'root'
-DB_PASSWORD = 'root'
-DB_HOST = 'localhost'
-DB_PORT = '3306'
-DB_NAME = 'project_phonepe_pulse'
+# PHONEPE_DB_<KEY> configures the primary (write route, used by the ETL); the app reads through
+# PHONEPE_DB_READ_<KEY>, e.g. a local replica, which falls back to the primary setting per key.
+# PHONEPE_DB_WRITE_URL / PHONEPE_DB_READ_URL override a whole route with a SQLAlchemy URL.
+DB_DEFAULTS = {"USER": "root", "PASSWORD": "root", "HOST": "localhost", "PORT": "3306", "NAME": "project_phonepe_pulse"}
+READ_ROUTE_RETRY_SECONDS = int(os.environ.get("PHONEPE_READ_ROUTE_RETRY_SECONDS", 30))
 
-# MYSQL Connection
+def engine_url(route):
+    url = os.environ.get(f"PHONEPE_DB_{route}_URL")
+    if url:
+        return url
+    setting = {key: os.environ.get(f"PHONEPE_DB_{route}_{key}", os.environ.get(f"PHONEPE_DB_{key}", default))
+               for key, default in DB_DEFAULTS.items()}
+    return f"mysql+mysqlconnector://{setting['USER']}:{setting['PASSWORD']}@{setting['HOST']}:{setting['PORT']}/{setting['NAME']}"
 
-engine = create_engine(f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+# MYSQL Connection
 
+@st.cache_resource
+def db_engines():
+    writer = create_engine(engine_url("WRITE"), pool_pre_ping=True)
+    read_url = engine_url("READ")
+    reader = writer if read_url == engine_url("WRITE") else create_engine(read_url, pool_pre_ping=True)
+    return {"writer": writer, "reader": reader, "reader_down_until": 0.0}
+
+def mark_reader_down():
+    db_engines()["reader_down_until"] = time.time() + READ_ROUTE_RETRY_SECONDS
+
+def read_engine():
+    # Read route, or the primary while the reader is marked down after a connection failure
+    engines = db_engines()
+    if time.time() < engines["reader_down_until"]:
+        return engines["writer"]
+    return engines["reader"]
+
+@contextmanager
+def read_connection():
+    engines = db_engines()
+    try:
+        conn = read_engine().connect()
+    except OperationalError:
+        if engines["reader"] is engines["writer"]:
+            raise
+        mark_reader_down()
+        conn = engines["writer"].connect()
+    with conn:
+        yield conn
+
+# Query Instrumentation
+
+QUERY_LOG_SIZE = int(os.environ.get("PHONEPE_QUERY_LOG_SIZE", 2000))
+QUERY_LOG_FILE = os.environ.get("PHONEPE_QUERY_LOG_FILE")
+SLOW_QUERY_MS = float(os.environ.get("PHONEPE_SLOW_QUERY_MS", 500))
+ADMIN_PANEL = os.environ.get("PHONEPE_ADMIN_PANEL", "0") == "1"
+
+query_logger = logging.getLogger("phonepe.queries")
+
+@st.cache_resource
+def query_log():
+    # Shared by every session; the structured log goes to PHONEPE_QUERY_LOG_FILE as JSON lines
+    if QUERY_LOG_FILE and not query_logger.handlers:
+        handler = logging.FileHandler(QUERY_LOG_FILE)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        query_logger.addHandler(handler)
+        query_logger.setLevel(logging.INFO)
+    return {"lock": threading.Lock(), "records": deque(maxlen=QUERY_LOG_SIZE)}
+
+def sql_fingerprint(query):
+    # Literals are masked so the same statement with different filters shares one fingerprint
+    sql = re.sub(r"'(?:[^']|'')*'", "?", str(query))
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\s+", " ", sql).strip()
+    return hashlib.sha1(sql.encode()).hexdigest()[:12], sql
+
+# Shared query helpers: called from many sections, so the section is the app function calling them
+QUERY_HELPERS = {"read_sql", "read_sql_many", "execute_query", "compiled_frame", "leaderboard", "growth_between",
+                 "rising_districts", "detail_page", "detail_table", "cached_frame", "cached_figure", "cached_figure_entry",
+                 "<lambda>", "<listcomp>", "<genexpr>"}
+
+def query_call_site():
+    # Section is the innermost app function issuing the query outside QUERY_HELPERS (the innermost
+    # helper when there is none, e.g. API requests), page the nearest *_page / *_analysis caller
+    page, section, helper = None, None, None
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == __file__ and code.co_name != "<module>":
+            if code.co_name in QUERY_HELPERS:
+                helper = helper or f"{code.co_name}:{frame.f_lineno}"
+            elif section is None:
+                section = f"{code.co_name}:{frame.f_lineno}"
+            if page is None and code.co_name.endswith(("_page", "_analysis")):
+                page = code.co_name
+        frame = frame.f_back
+    return page or "-", section or helper or "-"
+
+# Result Frames
+
+# Text columns become Arrow-backed strings and numbers take the smallest dtype that holds them
+# exactly; the query log keeps both the fetched and the compacted size of every frame
+COMPACT_FRAMES = os.environ.get("PHONEPE_COMPACT_FRAMES", "1") == "1"
+
+def arrow_frame(table):
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow"),
+                                         pa.large_string(): pd.StringDtype("pyarrow")}.get)
+
+def fetch_frame(query, con, params=None):
+    # Columnar fetch straight into Arrow when connectorx is installed; queries on a connection
+    # rely on its session state (temporary tables, sql_mode) and keep the DBAPI path
+    if params:
+        return pd.read_sql(text(query), con, params=params)
+    if cx is not None and isinstance(con, Engine) and isinstance(query, str):
+        url = con.url.set(drivername="mysql").render_as_string(hide_password=False)
+        try:
+            return arrow_frame(cx.read_sql(url, query, return_type="arrow"))
+        except RuntimeError:
+            # connectorx reports connection and SQL errors alike as RuntimeError. The DBAPI retry raises
+            # them as OperationalError/ProgrammingError, which the reader fallback, poll_load_version
+            # and the snapshot refresher handle
+            pass
+    return pd.read_sql(query, con)
+
+def compact_frame(df):
+    columns = {}
+    for column, dtype in df.dtypes.items():
+        values = df[column]
+        if dtype == object and pa is not None and values.map(lambda v: v is None or isinstance(v, str)).all():
+            columns[column] = values.astype(pd.StringDtype("pyarrow"))
+        elif pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+            columns[column] = pd.to_numeric(values, downcast='integer')
+        elif pd.api.types.is_float_dtype(dtype) and dtype != np.float32 and not pd.api.types.is_extension_array_dtype(dtype):
+            narrow = values.astype(np.float32)
+            if np.array_equal(narrow.to_numpy(dtype=np.float64), values.to_numpy(), equal_nan=True):
+                columns[column] = narrow
+    return df.assign(**columns) if columns else df
+
+def query_key(query, params=None):
+    return hashlib.sha1(repr((str(query), sorted((params or {}).items()))).encode()).hexdigest()
+
+def read_sql(query, con, shared=True, params=None, call_site=None, snapshot=False):
+    # snapshot=True marks results worth keeping in the warm-start snapshot (see Warm-start Snapshot)
+    call_site = call_site or query_call_site()
+    key = query_key(query, params)
+    if shared:
+        df = snapshot_lookup(key)
+        if df is not None:
+            return df
+    if shared and SHARED_CACHE_PATH:
+        # Every worker process asks the shared cache first, only one of them runs a missing query
+        payload = shared_cache_fetch("sql:" + key, lambda: pickle.dumps(execute_query(query, con, call_site, params), protocol=pickle.HIGHEST_PROTOCOL))
+        df = pickle.loads(payload)
+    else:
+        df = execute_query(query, con, call_site, params)
+    if shared and snapshot:
+        snapshot_stage(key, query, params, df)
+    return df
+
+def execute_query(query, con, call_site, params=None):
+    start = time.perf_counter()
+    engines = db_engines()
+    try:
+        if async_enabled(con):
+            df = run_async(fetch_frame_async(query, params))
+        else:
+            df = fetch_frame(query, con, params)
+    except OperationalError:
+        if con is not engines["reader"] or engines["reader"] is engines["writer"]:
+            raise
+        mark_reader_down()
+        df = fetch_frame(query, engines["writer"], params)
+    return record_query(df, query, call_site, (time.perf_counter() - start) * 1000)
+
+def record_query(df, query, call_site, ms):
+    page, section = call_site
+    fingerprint, sql = sql_fingerprint(query)
+    fetched_bytes = int(df.memory_usage(deep=True).sum())
+    if COMPACT_FRAMES:
+        df = compact_frame(df)
+    record = {"ts": round(time.time(), 3),
+              "page": page,
+              "section": section,
+              "fingerprint": fingerprint,
+              "ms": round(ms, 2),
+              "rows": len(df),
+              "fetched_bytes": fetched_bytes,
+              "bytes": int(df.memory_usage(deep=True).sum()),
+              "sql": sql[:500]}
+    query_logger.info(json.dumps(record))
+    log = query_log()
+    with log["lock"]:
+        log["records"].append(record)
+    # Per-session counter, read by benchmarks/load_test.py; API threads and benchmarks run without a
+    # script run context and therefore without a session to count in
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        st.session_state["query_count"] = st.session_state.get("query_count", 0) + 1
+    return df
+
+# Async Query Path
+
+# Opt-in (PHONEPE_ASYNC_DB=1): reads on the read route go through an async driver on one event loop
+# in a background thread. Sessions waiting on MySQL then hold no pool thread, and a page's
+# independent queries are awaited together (read_sql_many). At most PHONEPE_ASYNC_MAX_CONCURRENCY
+# queries are in flight per process; the sync engines stay in place for the writer fallback
+ASYNC_DB = os.environ.get("PHONEPE_ASYNC_DB", "0") == "1"
+ASYNC_DRIVER = os.environ.get("PHONEPE_DB_ASYNC_DRIVER", "aiomysql")
+ASYNC_MAX_CONCURRENCY = int(os.environ.get("PHONEPE_ASYNC_MAX_CONCURRENCY", 16))
+
+@st.cache_resource
+def async_runtime():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="phonepe-async-db", daemon=True).start()
+
+    async def setup():
+        # The semaphore and the pool belong to the loop they are created on
+        engine = create_async_engine(make_url(engine_url("READ")).set(drivername=f"mysql+{ASYNC_DRIVER}"),
+                                     pool_pre_ping=True, pool_size=ASYNC_MAX_CONCURRENCY, max_overflow=0)
+        return engine, asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+
+    engine, semaphore = asyncio.run_coroutine_threadsafe(setup(), loop).result()
+    return {"loop": loop, "engine": engine, "semaphore": semaphore}
+
+def async_enabled(con):
+    return ASYNC_DB and create_async_engine is not None and con is read_engine() and con is db_engines()["reader"]
+
+def run_async(coroutine):
+    return asyncio.run_coroutine_threadsafe(coroutine, async_runtime()["loop"]).result()
+
+async def fetch_frame_async(query, params=None):
+    runtime = async_runtime()
+    async with runtime["semaphore"]:
+        async with runtime["engine"].connect() as conn:
+            result = await conn.execute(text(str(query)), params or {})
+            return pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()), coerce_float=True)
+
+async def fetch_frames_async(queries):
+    async def timed(query):
+        start = time.perf_counter()
+        df = await fetch_frame_async(query)
+        return df, (time.perf_counter() - start) * 1000
+    return await asyncio.gather(*(timed(query) for query in queries))
+
+def read_sql_many(queries, con, snapshot=False):
+    # Independent queries of one page: awaited as a batch on the async path, otherwise (and with
+    # the shared cache, which already coordinates workers per query) one after another
+    call_site = query_call_site()
+    if SHARED_CACHE_PATH or not async_enabled(con):
+        return [read_sql(query, con, call_site=call_site, snapshot=snapshot) for query in queries]
+    warm = [snapshot_lookup(query_key(query)) for query in queries]
+    if all(df is not None for df in warm):
+        return warm
+    try:
+        results = run_async(fetch_frames_async(queries))
+    except OperationalError:
+        mark_reader_down()
+        return [read_sql(query, db_engines()["writer"], call_site=call_site, snapshot=snapshot) for query in queries]
+    frames = [record_query(df, query, call_site, ms) for query, (df, ms) in zip(queries, results)]
+    for query, df in zip(queries, frames):
+        if snapshot:
+            snapshot_stage(query_key(query), query, None, df)
+    return frames
+
+# Render Profiler
+
+PROFILE_RATE = float(os.environ.get("PHONEPE_PROFILE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PHONEPE_PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.environ.get("PHONEPE_PROFILE_DIR", "profiles")
+
+# Any frame matching these wins, otherwise the outermost library frame under the app decides
+PROFILE_SERIALIZATION = ("/plotly/io/_json", "/_plotly_utils/utils", "/json/", "orjson")
+PROFILE_DATABASE = ("/sqlalchemy/", "/mysql/", "/pandas/io/sql")
+PROFILE_LIBRARIES = [("/plotly/", "figure construction"),
+                     ("/_plotly_utils/", "figure construction"),
+                     ("/pandas/", "DataFrame ops"),
+                     ("/numpy/", "DataFrame ops"),
+                     ("/streamlit/", "streamlit")]
+
+profiler_logger = logging.getLogger("phonepe.profiler")
+active_profilers = {}
+
+def profile_stack(frame):
+    # Root to leaf, cut at the outermost app frame so the Streamlit script runner is left out
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename.replace("\\", "/"), code.co_firstlineno))
+        frame = frame.f_back
+    app_frames = [i for i, (_, filename, _) in enumerate(stack) if filename == __file__.replace("\\", "/")]
+    if app_frames:
+        stack = stack[:app_frames[-1] + 1]
+    stack.reverse()
+    return stack
+
+def profile_category(stack):
+    filenames = [filename for _, filename, _ in stack]
+    if any(marker in filename for filename in filenames for marker in PROFILE_SERIALIZATION):
+        return "serialization"
+    if any(marker in filename for filename in filenames for marker in PROFILE_DATABASE):
+        return "database"
+    app_file = __file__.replace("\\", "/")
+    for filename in filenames:
+        if filename == app_file:
+            continue
+        for marker, category in PROFILE_LIBRARIES:
+            if marker in filename:
+                return category
+        return "python"
+    return "app code"
+
+class page_profiler:
+    def __init__(self, page):
+        self.page = page
+        self.thread_id = threading.get_ident()
+        self.sections = []
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name=f"profiler-{page}", daemon=True)
+
+    def sample(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        while not self.stop_event.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples.append((time.perf_counter(), tuple(self.sections), profile_stack(frame)))
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.sampler.join()
+        self.stopped = time.perf_counter()
+
+    def export(self):
+        # speedscope file with two views of the same samples: full call stacks and time per category
+        frames, frame_ids = [], {}
+        def frame_id(name, filename="", line=0):
+            key = (name, filename, line)
+            if key not in frame_ids:
+                frame_ids[key] = len(frames)
+                frames.append({"name": name, "file": filename, "line": line} if filename else {"name": name})
+            return frame_ids[key]
+
+        stacks, categories, weights, totals = [], [], [], {}
+        previous = self.started
+        for timestamp, sections, stack in self.samples:
+            weight = (timestamp - previous) * 1000
+            previous = timestamp
+            category = profile_category(stack)
+            totals[category] = totals.get(category, 0) + weight
+            prefix = [frame_id(f"page {self.page}")] + [frame_id(f"section {section}") for section in sections]
+            stacks.append(prefix + [frame_id(name, os.path.basename(filename), line) for name, filename, line in stack])
+            categories.append(prefix + [frame_id(f"[{category}]")])
+            weights.append(round(weight, 3))
+
+        end = round((self.stopped - self.started) * 1000, 3)
+        profile = {"$schema": "https://www.speedscope.app/file-format-schema.json",
+                   "name": f"{self.page} page view",
+                   "exporter": "phonepe_web_app",
+                   "shared": {"frames": frames},
+                   "profiles": [{"type": "sampled", "name": f"{self.page} - call stacks", "unit": "milliseconds",
+                                 "startValue": 0, "endValue": end, "samples": stacks, "weights": weights},
+                                {"type": "sampled", "name": f"{self.page} - categories", "unit": "milliseconds",
+                                 "startValue": 0, "endValue": end, "samples": categories, "weights": weights}]}
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        page_name = re.sub(r"\W+", "_", self.page).strip("_").lower()
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{page_name}-{self.thread_id}.speedscope.json")
+        with open(path, "w") as f:
+            json.dump(profile, f)
+        profiler_logger.info(json.dumps({"page": self.page, "path": path, "ms": end, "samples": len(weights),
+                                         "categories": {k: round(v, 1) for k, v in totals.items()}}))
+        return path
+
+@contextmanager
+def page_profile(page):
+    # Opt-in: PHONEPE_PROFILE_RATE is the fraction of page views that get sampled
+    if PROFILE_RATE <= 0 or random.random() >= PROFILE_RATE:
+        yield None
+        return
+    profiler = page_profiler(page)
+    active_profilers[profiler.thread_id] = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        active_profilers.pop(profiler.thread_id, None)
+        profiler.export()
+
+@contextmanager
+def profile_section(name):
+    profiler = active_profilers.get(threading.get_ident())
+    if profiler is not None:
+        profiler.sections.append(name)
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.sections.pop()
+
+# Shared Cache
+
+# With PHONEPE_SHARED_CACHE pointing at a SQLite file, every worker process behind the proxy
+# (deploy/run_workers.sh) shares query results and figures keyed by data version
+SHARED_CACHE_PATH = os.environ.get("PHONEPE_SHARED_CACHE")
+SHARED_CACHE_MAX_BYTES = int(os.environ.get("PHONEPE_SHARED_CACHE_MAX_MB", 1024)) * 1024 * 1024
+SINGLE_FLIGHT_LEASE = float(os.environ.get("PHONEPE_SINGLE_FLIGHT_LEASE", 120))
+
+@st.cache_resource
+def shared_cache_connections():
+    return threading.local()
+
+def shared_cache_db():
+    # One connection per thread, autocommit so each statement is its own transaction
+    local = shared_cache_connections()
+    db = getattr(local, "db", None)
+    if db is None:
+        db = sqlite3.connect(SHARED_CACHE_PATH, timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS entries(key TEXT PRIMARY KEY, version INTEGER,
+                      value BLOB, size INTEGER, used REAL)""")
+        db.execute("CREATE TABLE IF NOT EXISTS inflight(key TEXT PRIMARY KEY, expires REAL)")
+        local.db = db
+    return db
+
+def shared_cache_fetch(key, compute):
+    # Single flight across processes: whoever claims the inflight row computes, the rest wait for it
+    version = data_version()
+    key = f"{version}:{key}"
+    db = shared_cache_db()
+    while True:
+        row = db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            db.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+        now = time.time()
+        db.execute("DELETE FROM inflight WHERE key = ? AND expires < ?", (key, now))
+        if db.execute("INSERT OR IGNORE INTO inflight (key, expires) VALUES (?, ?)", (key, now + SINGLE_FLIGHT_LEASE)).rowcount == 1:
+            break
+        time.sleep(0.05)
+    try:
+        value = compute()
+        db.execute("INSERT OR REPLACE INTO entries (key, version, value, size, used) VALUES (?, ?, ?, ?, ?)",
+                   (key, version, value, len(value), time.time()))
+        shared_cache_trim(db)
+    finally:
+        db.execute("DELETE FROM inflight WHERE key = ?", (key,))
+    return value
+
+def shared_cache_trim(db):
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= SHARED_CACHE_MAX_BYTES:
+        return
+    for key, size in db.execute("SELECT key, size FROM entries ORDER BY used").fetchall():
+        db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        total -= size
+        if total <= SHARED_CACHE_MAX_BYTES:
+            break
+
+# Data Version
+
+# The ETL bumps load_metadata.load_version on every data_transfer(); one tiny query per poll
+# interval (shared by all sessions) is enough to notice it, so data caches can keep long TTLs
+DATA_VERSION_POLL_SECONDS = int(os.environ.get("PHONEPE_DATA_VERSION_POLL_SECONDS", 5))
+DATA_CACHE_TTL = int(os.environ.get("PHONEPE_DATA_CACHE_TTL", 24 * 60 * 60))
+
+@st.cache_data(ttl=DATA_VERSION_POLL_SECONDS, show_spinner=False)
+def poll_load_version():
+    query = "SELECT MAX(load_version) AS load_version FROM load_metadata;"
+    try:
+        df = read_sql(query, read_engine(), shared=False)
+    except ProgrammingError:
+        # Database loaded before load_metadata existed
+        return 0
+    except OperationalError:
+        # MySQL unreachable: keep serving the warm-start snapshot, if there is one
+        version = snapshot_store()["version"]
+        if version is None:
+            raise
+        return version
+    return int(df.iloc[0,0] or 0)
+
+@st.cache_resource
+def data_version_state():
+    return {"lock": threading.Lock(), "version": None}
+
+def invalidate_caches(version):
+    st.cache_data.clear()
+    for cache in (figure_cache(), frame_cache(), color_range_cache()):
+        with cache["lock"]:
+            cache["entries"].clear()
+            if "size" in cache:
+                cache["size"] = 0
+    if SHARED_CACHE_PATH:
+        shared_cache_db().execute("DELETE FROM entries WHERE version < ?", (version,))
+
+def data_version():
+    version = poll_load_version()
+    state = data_version_state()
+    with state["lock"]:
+        if state["version"] != version:
+            if state["version"] is not None:
+                invalidate_caches(version)
+            state["version"] = version
+    return version
+
+# Warm-start Snapshot
+
+# Results of the queries read with snapshot=True (dimension lists, KPI totals, main-page trends and
+# compiled rollups) are kept as Arrow IPC files under PHONEPE_SNAPSHOT_DIR, one directory per load version.
+# A restarted worker memory-maps them, so its first renders are served locally, also while MySQL is
+# unreachable; a background thread writes new results and rebuilds the snapshot for a newer version
+SNAPSHOT_DIR = os.environ.get("PHONEPE_SNAPSHOT_DIR", os.path.join(".cache", "snapshot"))
+SNAPSHOT_REFRESH_SECONDS = int(os.environ.get("PHONEPE_SNAPSHOT_REFRESH_SECONDS", 30))
+SNAPSHOT_MAX_ROWS = int(os.environ.get("PHONEPE_SNAPSHOT_MAX_ROWS", 50000))
+SNAPSHOT_MAX_ENTRIES = int(os.environ.get("PHONEPE_SNAPSHOT_MAX_ENTRIES", 500))
+
+snapshot_logger = logging.getLogger("phonepe.snapshot")
+
+def snapshot_enabled():
+    return pa is not None and bool(SNAPSHOT_DIR)
+
+@st.cache_resource
+def snapshot_store():
+    store = {"lock": threading.Lock(), "version": None, "entries": {}, "tables": {}, "pending": {}}
+    if not snapshot_enabled():
+        return store
+    manifest = os.path.join(SNAPSHOT_DIR, "manifest.json")
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            saved = json.load(f)
+        store["version"], store["entries"] = saved["version"], saved["entries"]
+    threading.Thread(target=snapshot_refresher, args=(store, db_engines()), name="phonepe-snapshot", daemon=True).start()
+    return store
+
+def snapshot_lookup(key):
+    if not snapshot_enabled():
+        return None
+    store = snapshot_store()
+    with store["lock"]:
+        if key not in store["entries"] or store["version"] != data_version_state()["version"]:
+            return None
+        table = store["tables"].get(key)
+        if table is None:
+            path = os.path.join(SNAPSHOT_DIR, f"v{store['version']}", f"{key}.arrow")
+            table = store["tables"][key] = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return arrow_frame(table)
+
+def snapshot_stage(key, query, params, df):
+    if not snapshot_enabled() or len(df) > SNAPSHOT_MAX_ROWS:
+        return
+    store = snapshot_store()
+    version = data_version_state()["version"]
+    with store["lock"]:
+        if version is None or (key in store["entries"] and store["version"] == version):
+            return
+        if len(store["entries"]) + len(store["pending"]) < SNAPSHOT_MAX_ENTRIES:
+            store["pending"][key] = (version, {"query": str(query), "params": params or {}}, df)
+
+def snapshot_write(path, df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(temp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temp, path)
+
+def snapshot_refresh(store, engines):
+    engine = engines["writer"] if time.time() < engines["reader_down_until"] else engines["reader"]
+    call_site = ("-", "snapshot_refresh")
+    live = int(execute_query("SELECT MAX(load_version) FROM load_metadata;", engine, call_site).iloc[0, 0] or 0)
+    with store["lock"]:
+        current, entries = store["version"], dict(store["entries"])
+        pending = {key: item for key, item in store["pending"].items() if item[0] == live}
+        store["pending"].clear()
+    if live == current and not pending:
+        return
+
+    directory = os.path.join(SNAPSHOT_DIR, f"v{live}")
+    os.makedirs(directory, exist_ok=True)
+    written = dict(entries) if live == current else {}
+    for key, (_, entry, df) in pending.items():
+        snapshot_write(os.path.join(directory, f"{key}.arrow"), df)
+        written[key] = entry
+    # A new version re-reads everything the old snapshot held, so the next restart is warm again
+    for key, entry in entries.items():
+        if key not in written:
+            df = compact_frame(execute_query(entry["query"], engine, call_site, entry["params"]))
+            snapshot_write(os.path.join(directory, f"{key}.arrow"), df)
+            written[key] = entry
+
+    manifest = os.path.join(SNAPSHOT_DIR, "manifest.json")
+    with open(f"{manifest}.{os.getpid()}.tmp", "w") as f:
+        json.dump({"version": live, "entries": written}, f)
+    os.replace(f"{manifest}.{os.getpid()}.tmp", manifest)
+    with store["lock"]:
+        store["version"], store["entries"], store["tables"] = live, written, {}
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name.startswith("v") and name != f"v{live}":
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+    snapshot_logger.info("snapshot of version %s holds %d results", live, len(written))
+
+def snapshot_refresher(store, engines):
+    while True:
+        try:
+            snapshot_refresh(store, engines)
+        except (OperationalError, ProgrammingError, OSError) as e:
+            # Database still unreachable or snapshot directory not writable; try again next round
+            snapshot_logger.warning("snapshot refresh skipped: %s", e)
+        time.sleep(SNAPSHOT_REFRESH_SECONDS)
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
 def state_list():
     query = "SELECT state FROM aggregated_transaction;"
-    df = pd.read_sql(query, engine)
+    df = read_sql(query, read_engine(), snapshot=True)
     state_list = df['state'].drop_duplicates().to_list()
     return sorted(state_list)
 
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
 def district_list():
     query = "SELECT state, district FROM top_transaction_districtwise;"
-    df = pd.read_sql(query, engine)
+    df = read_sql(query, read_engine(), snapshot=True)
     india_dict = df.groupby('state')['district'].apply(lambda x: sorted(set(x))).to_dict()
     return india_dict
 
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
 def year_list():
     query = "SELECT year FROM aggregated_transaction;"
-    df = pd.read_sql(query, engine)
+    df = read_sql(query, read_engine(), snapshot=True)
     year_list = df['year'].drop_duplicates().to_list()
     return year_list
 
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
 def quarter_list():
     query = "SELECT quarter FROM aggregated_transaction;"
-    df = pd.read_sql(query, engine)
+    df = read_sql(query, read_engine(), snapshot=True)
     quarter_list = df['quarter'].drop_duplicates().to_list()
     return sorted(quarter_list)
 
+# Query Compiler
+
+# Tables a filter set can be answered from, in order of preference: the dimensions each one can be
+# filtered and grouped on, the measures it holds and whether it is an ETL cube (CUBE_SOURCES), which
+# stores every subset of its dimensions with 'All' members so a request is a lookup, not a GROUP BY
+ROLLUPS = [("cube_transaction_type", ["state", "year", "quarter", "transaction_type"], ["transaction_count", "transaction_amount"], True),
+           ("cube_insurance_type", ["state", "year", "quarter", "type"], ["insurance_count", "insurance_amount"], True),
+           ("cube_user_brand", ["state", "year", "quarter", "brand"], ["user_count"], True),
+           ("cube_user_district", ["state", "district", "year", "quarter"], ["registered_users", "appopen_count"], True),
+           ("cube_transaction_district", ["state", "district", "year", "quarter"], ["transaction_count", "transaction_amount"], True),
+           ("cube_insurance_district", ["state", "district", "year", "quarter"], ["insurance_count", "insurance_amount"], True),
+           ("aggregated_transaction", ["state", "year", "quarter", "transaction_type"], ["transaction_count", "transaction_amount"], False),
+           ("aggregated_insurance", ["state", "year", "quarter", "type"], ["insurance_count", "insurance_amount"], False),
+           ("aggregated_user", ["state", "year", "quarter", "brand"], ["user_count"], False),
+           ("map_user", ["state", "year", "quarter", "district"], ["registered_users", "appopen_count"], False),
+           ("map_transaction", ["state", "year", "quarter", "district"], ["transaction_count", "transaction_amount"], False),
+           ("map_insurance", ["state", "year", "quarter", "district"], ["insurance_count", "insurance_amount"], False)]
+
+DIMENSIONS = ["state", "district", "year", "quarter", "transaction_type", "type", "brand"]
+
+def compile_query(measures, grain, filters):
+    # One canonical statement per (measures, grain, filtered dimensions): dimensions in a fixed order
+    # and filter values as bind parameters. A filter is a value, a list of values or "All" for none.
+    # A cube holds one row per member combination, so a list filter there must be part of the grain;
+    # on a table, asking for its full grain reads the rows as they are and anything coarser is summed
+    active = {dimension: value for dimension, value in filters.items() if not isinstance(value, str) or value != "All"}
+    needed = set(grain) | set(active)
+    listed = {dimension for dimension, value in active.items() if isinstance(value, (list, tuple))}
+    for table, dimensions, table_measures, cube in ROLLUPS:
+        if needed <= set(dimensions) and set(measures) <= set(table_measures) and (not cube or listed <= set(grain)):
+            break
+    else:
+        raise ValueError(f"No rollup has {', '.join(measures)} by {', '.join(sorted(needed))}")
+
+    grain = [dimension for dimension in DIMENSIONS if dimension in grain]
+    conditions, params = [], {}
+    for dimension in DIMENSIONS:
+        if dimension not in dimensions:
+            continue
+        if cube and dimension not in active:
+            conditions.append(f"{dimension} <> 'All'" if dimension in grain else f"{dimension} = 'All'")
+            continue
+        if dimension not in active:
+            continue
+        # Cubes keep year as text so that 'All' fits in the same column
+        values = active[dimension]
+        cast = str if cube and dimension == "year" else (lambda value: value)
+        if isinstance(values, (list, tuple)):
+            names = [f"{dimension}_{i}" for i in range(len(values))]
+            conditions.append(f"{dimension} IN ({', '.join(':' + name for name in names)})")
+            params.update(zip(names, map(cast, values)))
+        else:
+            conditions.append(f"{dimension} = :{dimension}")
+            params[dimension] = cast(values)
+
+    if cube:
+        select = ["CAST(year AS UNSIGNED) AS year" if dimension == "year" else dimension for dimension in grain] + list(measures)
+        group_by = ""
+    elif set(grain) == set(dimensions):
+        select, group_by = grain + list(measures), ""
+    else:
+        select = grain + [f"SUM({measure}) AS {measure}" for measure in measures]
+        group_by = "GROUP BY " + ", ".join(grain) if grain else ""
+    query = f"""SELECT {", ".join(select)} FROM {table}
+                {"WHERE " + " AND ".join(conditions) if conditions else ""}
+                {group_by} {"ORDER BY " + ", ".join(grain) if grain else ""};"""
+    return re.sub(r"\s+", " ", query).replace(" ;", ";"), params
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
+def compiled_frame(measures, grain, filters):
+    query, params = compile_query(measures, grain, filters)
+    return read_sql(query, read_engine(), params=params, snapshot=True)
+
+def grouped_iqr_bounds(df, group_columns, value_column):
+    # Q1/Q2/Q3 and 1.5*IQR fences for every group from one lexsort; quantiles interpolate
+    # linearly like Series.quantile. NaN values and NaN group keys are left out
+    if group_columns:
+        grouper = df.groupby(group_columns, sort=True)
+        codes = grouper.ngroup().to_numpy()
+        index = grouper.size().index
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+        index = pd.Index(['All'])
+    values = df[value_column].to_numpy(dtype=float)
+    keep = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+
+    counts = np.bincount(codes, minlength=len(index))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    def quantile(q):
+        position = starts + q * np.maximum(counts - 1, 0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        if not len(values):
+            return np.full(len(index), np.nan)
+        low_values = values[np.minimum(low, len(values) - 1)]
+        high_values = values[np.minimum(high, len(values) - 1)]
+        return np.where(present, low_values + (high_values - low_values) * (position - low), np.nan)
+
+    q1, q2, q3 = quantile(0.25), quantile(0.50), quantile(0.75)
+    iqr = q3 - q1
+    return pd.DataFrame({'q1': q1, 'q2': q2, 'q3': q3, 'iqr': iqr,
+                         'lower': q1 - 1.5 * iqr, 'upper': q3 + 1.5 * iqr}, index=index)
+
 def get_iqr_bounds(series):
-    s = series.sort_values()
-    Q1 = s.quantile(0.25)
-    Q2 = s.quantile(0.50)
-    Q3 = s.quantile(0.75)
-    IQR = Q3-Q1
-    lower = Q1-1.5*IQR
-    upper = Q3+1.5*IQR
-    print(lower, upper)
-    print(Q1, Q2, Q3)
-    return int(Q2), int(upper)
+    bounds = grouped_iqr_bounds(series.to_frame('value'), [], 'value').iloc[0]
+    return int(bounds['q2']), int(bounds['upper'])
 
 def value_formats(n):
     if n > 1e12:
@@ -79,15 +817,59 @@ def value_formats(n):
         return f"{n/1e3:.2f} k"
     else:
         return str(n)
+
+# Vectorised value_formats for whole columns/grids, NaN cells stay NaN
+VALUE_UNITS = [(1e12, "T"), (1e9, "B"), (1e7, "Cr"), (1e6, "M"), (1e3, "k")]
+
+def value_formats_array(values):
+    values = np.asarray(values)
+    numbers = values.astype(float)
+    labels = values.astype(str).astype(object)
+    done = np.zeros(numbers.shape, dtype=bool)
+    for unit, suffix in VALUE_UNITS:
+        mask = (numbers > unit) & ~done
+        labels[mask] = [f"{n:.2f} {suffix}" for n in numbers[mask] / unit]
+        done |= mask
+    labels[np.isnan(numbers)] = np.nan
+    return labels
+
+def with_value_formats(df, columns):
+    # Copy of df with formatted label columns, columns maps label column -> numeric column
+    return df.assign(**{label: value_formats_array(df[column]) for label, column in columns.items()})
+
+def heatmap_data(df, index, columns, value, measures, extras=()):
+    # One grouped pass for the z grid (mean, as pivot_table) and every hover column (first),
+    # measures are formatted after pivoting so each cell is formatted once
+    agg = {'z': (value, 'mean')}
+    for i, column in enumerate(list(measures) + list(extras)):
+        agg[f'c{i}'] = (column, 'first')
+    grid = df.groupby([index, columns], sort=True).agg(**agg).unstack(columns)
+
+    z = grid['z']
+    customdata = [value_formats_array(grid[f'c{i}'].to_numpy()) for i in range(len(measures))]
+    customdata += [grid[f'c{i}'].to_numpy(dtype=object) for i in range(len(measures), len(measures) + len(extras))]
+    return z.columns, z.index, z.to_numpy(), np.stack(customdata, axis=-1)
+
+def heatmap_figure(data, colorscale, hovertemplate, **layout):
+    x, y, z, customdata = data
+    fig = go.Figure(data=go.Heatmap(x=x,
+                                    y=y,
+                                    z=z,
+                                    colorscale=colorscale,
+                                    customdata=customdata,
+                                    hovertemplate=hovertemplate,
+                                    zmin=np.nanmin(z), zmax=np.nanmax(z)))
+    fig.update_layout(**layout)
+    return fig
     
 def geo_choropleth_plot(final_df, location_column, color_column, title, animation_column, mini, maxi, title_x=0.1):
     final_df[color_column + '_log'] = np.log1p(final_df[color_column])
     color_column = color_column + '_log'
 
-    if mini is None:
-        mini = final_df[color_column].min()
-    if maxi is None:
-        maxi = final_df[color_column].max()
+    if mini is None or maxi is None:
+        low, high = choropleth_color_range(final_df, color_column, animation_column)
+        mini = low if mini is None else mini
+        maxi = high if maxi is None else maxi
 
     fig = px.choropleth(final_df,
                             geojson="https://gist.githubusercontent.com/jbrobst/56c13bbbf9d97d187fea01ca62ea5112/raw/e388c4cae20aa53cb5090210a42ebb9b765c0a36/india_states.geojson",
@@ -140,8 +922,479 @@ def geo_choropleth_plot_statewise(final_df, location_column, color_column, title
     fig.update_coloraxes(colorbar_title=None)
     return fig
 
+# Figure Cache
+
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+@st.cache_resource
+def figure_cache():
+    # Shared by all sessions: built figures in LRU order, bounded by the total size of their JSON.
+    # st.plotly_chart only reads a figure (to_dict), so one object serves every session; callers
+    # must pass cached figures straight to it and never update them
+    return {"lock": threading.Lock(), "entries": OrderedDict(), "size": 0}
+
+def cached_figure_entry(section, filters, build_figure):
+    # (figure, JSON size in bytes); a dict or JSON would be validated into a new go.Figure on every
+    # st.plotly_chart call, a cached go.Figure is only serialised
+    key = (section, tuple(filters), data_version())
+    cache = figure_cache()
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry is not None:
+            cache["entries"].move_to_end(key)
+
+    if entry is None:
+        if SHARED_CACHE_PATH:
+            shared_key = "figure:" + hashlib.sha1(repr(key[:2]).encode()).hexdigest()
+            fig_json = shared_cache_fetch(shared_key, lambda: build_figure().to_json().encode()).decode()
+            entry = (pio.from_json(fig_json, skip_invalid=True), len(fig_json))
+        else:
+            fig = build_figure()
+            entry = (fig, len(fig.to_json()))
+        with cache["lock"]:
+            if key not in cache["entries"]:
+                cache["entries"][key] = entry
+                cache["size"] += entry[1]
+            while cache["size"] > FIGURE_CACHE_MAX_BYTES and len(cache["entries"]) > 1:
+                _, (_, old_size) = cache["entries"].popitem(last=False)
+                cache["size"] -= old_size
+    return entry
+
+def cached_figure(section, filters, build_figure):
+    with profile_section(section):
+        return cached_figure_entry(section, filters, build_figure)[0]
+
+# Section Frames
+
+FRAME_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+@st.cache_resource
+def frame_cache():
+    # Derived tables shown beside a cached figure, so a rerun skips their pandas work as well.
+    # LRU bounded by total frame memory, like the figure cache
+    return {"lock": threading.Lock(), "entries": OrderedDict(), "size": 0}
+
+def cached_frame(section, filters, build_frame):
+    key = (section, tuple(filters), data_version())
+    cache = frame_cache()
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry is not None:
+            cache["entries"].move_to_end(key)
+    if entry is None:
+        df = build_frame()
+        entry = (df, int(df.memory_usage(deep=True).sum()))
+        with cache["lock"]:
+            if key not in cache["entries"]:
+                cache["entries"][key] = entry
+                cache["size"] += entry[1]
+            while cache["size"] > FRAME_CACHE_MAX_BYTES and len(cache["entries"]) > 1:
+                _, (_, old_size) = cache["entries"].popitem(last=False)
+                cache["size"] -= old_size
+    return entry[0]
+
+# Colour Ranges
+
+def choropleth_color_range(final_df, log_column, group_column=None):
+    # Outlier fences per period keep one large state from flattening the scale for the rest
+    values = final_df[log_column]
+    bounds = grouped_iqr_bounds(final_df, [group_column] if group_column else [], log_column)
+    return max(values.min(), bounds['lower'].min()), min(values.max(), bounds['upper'].max())
+
+COLOR_RANGE_CACHE_MAX_ENTRIES = 4096
+
+@st.cache_resource
+def color_range_cache():
+    # (low, high) pairs in LRU order, bounded by entry count since every entry is the same size
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+def cached_color_range(section, filters, final_df, color_column, group_column=None):
+    key = (section, tuple(filters), color_column, group_column, data_version())
+    cache = color_range_cache()
+    with cache["lock"]:
+        color_range = cache["entries"].get(key)
+        if color_range is not None:
+            cache["entries"].move_to_end(key)
+    if color_range is None:
+        color_range = choropleth_color_range(final_df.assign(log_value=np.log1p(final_df[color_column])), 'log_value', group_column)
+        with cache["lock"]:
+            cache["entries"][key] = color_range
+            while len(cache["entries"]) > COLOR_RANGE_CACHE_MAX_ENTRIES:
+                cache["entries"].popitem(last=False)
+    return color_range
+
+# Animated Choropleths
+
+# 'animated' ships one map trace per period, 'on_demand' ships only the selected period,
+# 'auto' switches to on_demand once the animated payload would exceed the budget
+CHOROPLETH_MODE = os.environ.get("PHONEPE_CHOROPLETH_MODE", "auto")
+CHOROPLETH_PAYLOAD_BUDGET = int(os.environ.get("PHONEPE_CHOROPLETH_PAYLOAD_BUDGET", 250_000))
+
+def geo_choropleth_period(final_df, location_column, color_column, period_column, period, customdata_columns, hovertemplate, color_range=None):
+    # Colour range is taken over all periods so the scale stays fixed while moving the slider
+    if color_range is None:
+        color_range = choropleth_color_range(final_df.assign(log_value=np.log1p(final_df[color_column])), 'log_value', period_column)
+    period_df = final_df[final_df[period_column] == period]
+    fig = geo_choropleth_plot(period_df.copy(), location_column, color_column, "", None, *color_range)
+    fig.update_traces(customdata=period_df[customdata_columns].values, hovertemplate=hovertemplate)
+    return fig
+
+def choropleth_by_period(section, filters, final_df, color_column, period_column, build_animated, customdata_columns, hovertemplate, formats=None):
+    # formats: label columns of customdata_columns, added with with_value_formats only when a period map is built
+    periods = sorted(final_df[period_column].unique())
+
+    def period_entry(period):
+        return cached_figure_entry(f"{section}.{period_column}", tuple(filters) + (period,),
+                                  lambda: geo_choropleth_period(with_value_formats(final_df, formats or {}), 'state', color_column, period_column, period,
+                                                                customdata_columns, hovertemplate,
+                                                                cached_color_range(section, filters, final_df, color_column, period_column)))
+
+    mode = CHOROPLETH_MODE
+    if mode == "auto":
+        # Every animation frame carries the same trace as a single period map
+        mode = "on_demand" if period_entry(periods[-1])[1] * (len(periods) + 1) > CHOROPLETH_PAYLOAD_BUDGET else "animated"
+
+    if mode == "animated":
+        st.plotly_chart(cached_figure(section, filters, build_animated), use_container_width=True)
+    else:
+        period = st.select_slider(f"{period_column.title()}:", options=periods, value=periods[-1], key=f"{section}.{period_column}")
+        st.plotly_chart(period_entry(period)[0], use_container_width=True)
+
 # ----------------------------------------------- HOME PAGE -------------------------------------------------- #
 
+# KPI Totals
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
+def kpi_totals(version):
+    query = """SELECT (SELECT SUM(registered_users) FROM map_user) AS total_users,
+                      (SELECT SUM(transaction_count) FROM aggregated_transaction) AS total_trans,
+                      (SELECT SUM(insurance_count) FROM map_insurance) AS total_insurance;"""
+    return read_sql(query, read_engine(), snapshot=True)
+
+# Leaderboards
+
+def leaderboard(metric, geo_level, year, quarter, band, n, value_column, by_period=False):
+    # Ranks are materialized per load by the ETL (Leaderboard table), so each band is an indexed range read
+    rank_filter = {"top": "rank_desc <= :n",
+                   "bottom": "rank_asc <= :n",
+                   "moderate": "rank_desc > :n AND rank_asc > :n"}[band]
+    entity = "" if geo_level == 'state' else f", entity AS {geo_level}"
+    query = f"""SELECT state{entity}, entity_year AS year, entity_quarter AS quarter, value AS {value_column}, amount
+                FROM leaderboard
+                WHERE metric = :metric AND geo_level = :geo_level AND year = :year AND quarter = :quarter
+                AND by_period = :by_period AND {rank_filter} ORDER BY rank_desc;"""
+    df = read_sql(query, read_engine(), params={"metric": metric, "geo_level": geo_level, "year": str(year),
+                                                "quarter": quarter, "by_period": int(by_period), "n": int(n)})
+    unused = [column for column, used in (('year', year != "All" or by_period),
+                                          ('quarter', quarter != "All" or by_period),
+                                          ('amount', df['amount'].notna().any())) if not used]
+    df = df.drop(columns=unused)
+    for column in (value_column, 'amount'):
+        if column in df:
+            df[column + '_f'] = value_formats_array(df[column])
+    return df
+
+# Detail Tables
+
+DETAIL_PAGE_SIZE = int(os.environ.get("PHONEPE_DETAIL_PAGE_SIZE", 50))
+
+# Columns the detail tables can sort and filter on ("text" or "number"). The ETL indexes each of
+# them, and InnoDB secondary indexes end in the primary key, so (column, id) is already index order
+DETAIL_TABLES = {"aggregated_transaction": {"state": "text", "year": "number", "quarter": "text", "transaction_type": "text",
+                                            "transaction_count": "number", "transaction_amount": "number"},
+                 "top_transaction_districtwise": {"state": "text", "year": "number", "quarter": "text", "district": "text",
+                                                  "transaction_count": "number", "transaction_amount": "number"}}
+
+def detail_page(table, conditions, params, sort, descending, after, size):
+    # One page in (sort, id) order after the keyset cursor; the extra row only says whether there is a next page.
+    # conditions only name bind parameters, every value travels in params
+    direction, op = ("DESC", "<") if descending else ("ASC", ">")
+    if after is not None:
+        conditions = conditions + [f"({sort}, id) {op} (:after_value, :after_id)"]
+        value = after[0].item() if isinstance(after[0], np.generic) else after[0]
+        params = {**params, "after_value": value, "after_id": int(after[1])}
+    query = f"""SELECT id, {", ".join(DETAIL_TABLES[table])} FROM {table}
+                {"WHERE " + " AND ".join(conditions) if conditions else ""}
+                ORDER BY {sort} {direction}, id {direction} LIMIT {size + 1};"""
+    return read_sql(query, read_engine(), params=params)
+
+def detail_table(key, table, filters):
+    # Paginated replacement for st.dataframe(df) on whole tables: sort and filter run in SQL and
+    # only the current page reaches the browser. filters are the page's selections, "All" is no filter
+    columns = DETAIL_TABLES[table]
+    col1, col2, col3, col4 = st.columns([0.3, 0.2, 0.25, 0.25])
+    with col1:
+        sort = st.selectbox("Sort by:", list(columns), key=f"{key}.sort")
+    with col2:
+        descending = st.toggle("Descending", value=columns[sort] == "number", key=f"{key}.desc")
+    with col3:
+        search_column = st.selectbox("Filter on:", [None] + list(columns), key=f"{key}.search_column",
+                                     format_func=lambda column: "No filter" if column is None else column)
+    with col4:
+        search = st.text_input("Contains:" if columns.get(search_column) == "text" else "At least:",
+                               key=f"{key}.search", disabled=search_column is None).strip()
+
+    params = {column: value for column, value in filters.items() if value != "All"}
+    conditions = [f"{column} = :{column}" for column in params]
+    if search_column is not None and search:
+        if columns[search_column] == "text":
+            pattern = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append(f"{search_column} LIKE :search")
+            params["search"] = "%" + pattern + "%"
+        else:
+            try:
+                threshold = float(search)
+            except ValueError:
+                threshold = None
+            # float() also takes nan, inf and 1e999, none of which is a usable bound
+            if threshold is not None and math.isfinite(threshold):
+                conditions.append(f"{search_column} >= :search")
+                params["search"] = threshold
+            else:
+                st.caption(f"{search_column} filter needs a number")
+
+    # Cursor stack: entry i is the keyset the i-th page starts after; any change of view starts over
+    view = (table, tuple(conditions), tuple(sorted(params.items())), sort, descending)
+    state = st.session_state.get(f"{key}.pages")
+    if state is None or state["view"] != view:
+        state = st.session_state[f"{key}.pages"] = {"view": view, "cursors": [None]}
+    cursors = state["cursors"]
+
+    page = detail_page(table, conditions, params, sort, descending, cursors[-1], DETAIL_PAGE_SIZE)
+    has_next = len(page) > DETAIL_PAGE_SIZE
+    page = page.iloc[:DETAIL_PAGE_SIZE]
+    st.dataframe(page.drop(columns='id'), hide_index=True, use_container_width=True)
+
+    def next_page():
+        last = page.iloc[-1]
+        cursors.append((last[sort], int(last['id'])))
+
+    def previous_page():
+        cursors.pop()
+
+    col1, col2, col3 = st.columns([0.2, 0.6, 0.2])
+    with col1:
+        st.button("Previous", key=f"{key}.previous", on_click=previous_page, disabled=len(cursors) == 1)
+    with col2:
+        st.caption(f"Page {len(cursors)} · rows {(len(cursors) - 1) * DETAIL_PAGE_SIZE + 1}-{(len(cursors) - 1) * DETAIL_PAGE_SIZE + len(page)}"
+                   if len(page) else "No rows")
+    with col3:
+        st.button("Next", key=f"{key}.next", on_click=next_page, disabled=not has_next)
+
+# Exports
+
+# The export links point at phonepe_api.py (/api/export), which streams the rows from MySQL in
+# keyset chunks, so an export never builds a DataFrame in a Streamlit worker
+EXPORT_URL = os.environ.get("PHONEPE_EXPORT_URL", "http://127.0.0.1:8600/api/export")
+
+# section: (table, columns, filter columns)
+EXPORT_SECTIONS = {"user.engagement": ("map_user", ["state", "year", "quarter", "district", "registered_users", "appopen_count"],
+                                       ["state", "year", "quarter", "district"]),
+                   "user.devices": ("aggregated_user", ["state", "year", "quarter", "brand", "user_count", "user_percentage"],
+                                    ["state", "year", "quarter", "brand"]),
+                   "user.registration": ("top_user_districtwise", ["state", "year", "quarter", "district", "registered_users"],
+                                         ["state", "year", "quarter", "district"]),
+                   "transaction.payment_mode": ("aggregated_transaction", ["state", "year", "quarter", "transaction_type", "transaction_count", "transaction_amount"],
+                                                ["state", "year", "quarter", "transaction_type"]),
+                   "transaction.districts": ("map_transaction", ["state", "year", "quarter", "district", "transaction_count", "transaction_amount"],
+                                             ["state", "year", "quarter", "district"]),
+                   "transaction.top_districts": ("top_transaction_districtwise", ["state", "year", "quarter", "district", "transaction_count", "transaction_amount"],
+                                                 ["state", "year", "quarter", "district"]),
+                   "insurance.districts": ("map_insurance", ["state", "year", "quarter", "district", "insurance_count", "insurance_amount"],
+                                           ["state", "year", "quarter", "district"])}
+
+def export_query(section, filters):
+    # One chunk in id order after :after; the caller binds :after and :size and loops until a short chunk
+    table, columns, filter_columns = EXPORT_SECTIONS[section]
+    params = {column: value for column, value in filters.items() if column in filter_columns and value != "All"}
+    conditions = [f"{column} = :{column}" for column in params] + ["id > :after"]
+    query = f"""SELECT id, {", ".join(columns)} FROM {table}
+                WHERE {" AND ".join(conditions)} ORDER BY id LIMIT :size;"""
+    return query, params
+
+def export_links(section, filters):
+    params = {"section": section, **{column: value for column, value in filters.items() if value != "All"}}
+    col1, col2, _ = st.columns([0.15, 0.15, 0.7])
+    with col1:
+        st.link_button("Export CSV", f"{EXPORT_URL}?{urlencode({**params, 'format': 'csv'})}")
+    with col2:
+        st.link_button("Export Parquet", f"{EXPORT_URL}?{urlencode({**params, 'format': 'parquet'})}")
+
+# Location Index
+
+# Coordinates come from the ETL's location dimension (one row per district, state centroids with
+# district ''). Each bubble map keeps its rows in a uniform grid of PHONEPE_LOCATION_CELL_DEGREES
+# cells, so a bounding box only reads the cells it overlaps and a nearest-location search widens
+# ring by ring until nothing outside the searched square can be closer
+LOCATION_CELL_DEGREES = float(os.environ.get("PHONEPE_LOCATION_CELL_DEGREES", 1.0))
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+class location_index:
+    def __init__(self, df, cell=LOCATION_CELL_DEGREES):
+        self.df = df.dropna(subset=['latitude', 'longitude']).reset_index(drop=True)
+        self.cell = cell
+        self.lat = self.df['latitude'].to_numpy(dtype=np.float64)
+        self.lon = self.df['longitude'].to_numpy(dtype=np.float64)
+        keys = np.stack([np.floor(self.lat / cell), np.floor(self.lon / cell)], axis=1).astype(np.int64)
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+        cells, starts = np.unique(keys[order], axis=0, return_index=True)
+        self.cells = {tuple(key): rows for key, rows in zip(cells.tolist(), np.split(order, starts[1:]))}
+        self.bounds = (keys[:, 0].min(), keys[:, 0].max(), keys[:, 1].min(), keys[:, 1].max()) if len(keys) else (0, -1, 0, -1)
+        self.max_abs_lat = np.abs(self.lat).max() if len(self.lat) else 0.0
+
+    def cell_of(self, lat, lon):
+        return int(np.floor(lat / self.cell)), int(np.floor(lon / self.cell))
+
+    def rows_in(self, cells):
+        rows = [self.cells[key] for key in cells if key in self.cells]
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def bbox(self, south, north, west, east):
+        (i0, j0), (i1, j1) = self.cell_of(south, west), self.cell_of(north, east)
+        i0, i1 = max(i0, self.bounds[0]), min(i1, self.bounds[1])
+        j0, j1 = max(j0, self.bounds[2]), min(j1, self.bounds[3])
+        rows = self.rows_in((i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1))
+        inside = ((self.lat[rows] >= south) & (self.lat[rows] <= north) &
+                  (self.lon[rows] >= west) & (self.lon[rows] <= east))
+        return self.df.iloc[np.sort(rows[inside])]
+
+    def ring(self, i0, j0, r):
+        if r == 0:
+            return [(i0, j0)]
+        return ([(i0 + di, j0 + dj) for di in range(-r, r + 1) for dj in (-r, r)] +
+                [(i0 + di, j0 + dj) for di in (-r, r) for dj in range(-r + 1, r)])
+
+    def ring_km(self, lat, r):
+        # Lower bound on the distance to any location outside the square of rings 0..r: it is at least
+        # r cells away in latitude, or in longitude at a latitude no further from the equator than the data
+        degrees = np.radians(min(r * self.cell, 180.0))
+        cos_lat = np.cos(np.radians(max(self.max_abs_lat, abs(lat))))
+        return EARTH_RADIUS_KM * min(degrees, 2 * np.arcsin(cos_lat * np.sin(degrees / 2)))
+
+    def nearest(self, lat, lon, k=5):
+        k = min(k, len(self.df))
+        if k == 0:
+            return self.df.assign(distance_km=np.empty(0))
+        i0, j0 = self.cell_of(lat, lon)
+        last = max(abs(i0 - self.bounds[0]), abs(i0 - self.bounds[1]), abs(j0 - self.bounds[2]), abs(j0 - self.bounds[3]))
+        found = []
+        for r in range(last + 1):
+            found.append(self.rows_in(self.ring(i0, j0, r)))
+            rows = np.concatenate(found)
+            if len(rows) >= k:
+                distance = haversine_km(lat, lon, self.lat[rows], self.lon[rows])
+                if np.partition(distance, k - 1)[k - 1] <= self.ring_km(lat, r):
+                    break
+        order = np.argsort(distance, kind='stable')[:k]
+        return self.df.iloc[rows[order]].assign(distance_km=distance[order])
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def district_user_index(version):
+    # One statement with a derived table: a TEMPORARY table would outlive the query on the pooled
+    # connection and clash with the next build that gets the same connection
+    query = """SELECT u.state, u.district, u.users, l.longitude, l.latitude
+               FROM (SELECT state, district, SUM(registered_users) AS users
+                     FROM top_user_districtwise GROUP BY state, district) AS u
+               INNER JOIN location_dim AS l ON u.state = l.state AND u.district = l.district;"""
+    df = read_sql(query, read_engine())
+    df['users_f'] = df['users'].apply(value_formats)
+    return location_index(df)
+
+# Marker Clustering
+
+# Bubble maps send at most PHONEPE_MAP_MAX_MARKERS markers: the points inside the estimated viewport
+# are binned into grid cells about PHONEPE_CLUSTER_RADIUS_PX pixels wide at the chosen zoom (widening
+# the cell by sqrt(2), about half the markers, until the budget holds), and each cell becomes one marker at the value-weighted centroid
+# of its points, with their values summed
+MAP_MAX_MARKERS = int(os.environ.get("PHONEPE_MAP_MAX_MARKERS", 400))
+CLUSTER_RADIUS_PX = int(os.environ.get("PHONEPE_CLUSTER_RADIUS_PX", 30))
+MAP_ZOOM_LEVELS = [4, 5, 6, 7, 8, 9]
+MAP_VIEW_PX = (1000, 450)
+
+def degrees_per_pixel(zoom):
+    return 360 / (256 * 2 ** zoom)
+
+def map_viewport(center, zoom, size=MAP_VIEW_PX):
+    # (south, north, west, east) of a size[0] x size[1] pixel map; Mercator shrinks the latitude span by cos(lat)
+    half_lon = size[0] / 2 * degrees_per_pixel(zoom)
+    half_lat = size[1] / 2 * degrees_per_pixel(zoom) * np.cos(np.radians(center['lat']))
+    return center['lat'] - half_lat, center['lat'] + half_lat, center['lon'] - half_lon, center['lon'] + half_lon
+
+def cluster_points(df, value_column, zoom, label_columns, max_markers=MAP_MAX_MARKERS):
+    lat = df['latitude'].to_numpy(dtype=np.float64)
+    lon = df['longitude'].to_numpy(dtype=np.float64)
+    value = df[value_column].to_numpy(dtype=np.float64)
+    if len(df) == 0:
+        return pd.DataFrame(columns=['latitude', 'longitude', value_column, 'points'] + label_columns)
+
+    cell = CLUSTER_RADIUS_PX * degrees_per_pixel(zoom)
+    while True:
+        rows = np.floor(lat / cell).astype(np.int64)
+        cols = np.floor(lon / cell).astype(np.int64)
+        key = (rows - rows.min()) * (cols.max() - cols.min() + 1) + (cols - cols.min())
+        codes, cells = pd.factorize(key)
+        if len(cells) <= max_markers:
+            break
+        cell *= np.sqrt(2)
+
+    n = len(cells)
+    total = np.bincount(codes, weights=value, minlength=n)
+    # Clusters whose values sum to zero fall back to the plain mean position
+    weights = np.where((total > 0)[codes], value, 1.0)
+    weight_sum = np.bincount(codes, weights=weights, minlength=n)
+    clusters = pd.DataFrame({'latitude': np.bincount(codes, weights=weights * lat, minlength=n) / weight_sum,
+                             'longitude': np.bincount(codes, weights=weights * lon, minlength=n) / weight_sum,
+                             value_column: total,
+                             'points': np.bincount(codes, minlength=n)})
+    for column in label_columns:
+        grouped = df[column].groupby(codes, sort=True)
+        distinct = grouped.nunique().to_numpy()
+        clusters[column] = np.where(distinct > 1, [f"{count} {column}s" for count in distinct], grouped.first().to_numpy())
+    return clusters
+
+@st.cache_resource
+def india_state_outlines():
+    with open("india_states.geojson") as f:
+        india_geojson = json.load(f)
+    return india_geojson, [feature["properties"]["ST_NM"] for feature in india_geojson["features"]]
+
+def district_bubble_figure(points, center, zoom):
+    # Setting India States as background map
+    india_geojson, state_names = india_state_outlines()
+    fig = go.Figure()
+    fig.add_trace(go.Choroplethmapbox(
+                geojson=india_geojson,
+                locations=state_names,
+                z=[0]*len(state_names),
+                featureidkey="properties.ST_NM",
+                colorscale=[[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+                showscale=False,
+                marker_line_color='white',
+                marker_line_width=0.5))
+    
+    # Plotting Bubbles on top
+    min_size = 5
+    max_size = 50
+    # Normalize users to marker sizes between 5 and 50
+    size_scaled = np.interp(points['users'], (points['users'].min(), points['users'].max()), (min_size, max_size))
+    fig.add_trace(go.Scattermapbox(lon=points['longitude'],
+        lat=points['latitude'],
+        mode="markers",
+        marker=dict(size=size_scaled,
+            color="#8D14FF",
+            opacity=0.6),
+        customdata=points[['state', 'district', 'users_f', 'latitude', 'longitude']].round({'latitude': 4, 'longitude': 4}),
+        hovertemplate="<b>State: %{customdata[0]}</b><br>District: %{customdata[1]}<br>Users: %{customdata[2]}<br>Latitude: %{customdata[3]}<br>Longitude: %{customdata[4]}<extra></extra>"))
+
+    fig.update_layout(mapbox=dict(style="carto-darkmatter",center=center,zoom=zoom,),
+                    margin={"r":0,"t":0,"l":0,"b":0})
+    return fig
+
 def main_page():
     st.markdown("<h1 style='color: violet;'>PHONEPE PULSE DATA INSIGHTS</h1>", unsafe_allow_html=True)
     st.markdown("PhonePe Pulse is an open data platform launched by PhonePe that provides insights into digital payment trends across India. It includes transaction statistics categorized by geography (state, district, pincode), time (year, quarter), and type (peer-to-peer, merchant payments, recharges, etc.). The data is made publicly accessible to promote research and innovation in the fintech space.")
@@ -149,41 +1402,32 @@ def main_page():
 
     col1, col2, col3 = st.columns(3)
 
-    with col1:
-        query = "SELECT SUM(registered_users) as total_users FROM map_user;"
-        df = pd.read_sql(query, engine)
+    kpis = kpi_totals(data_version())
 
+    # The three trend charts are independent, so their queries go out as one batch
+    queries = ["""SELECT year, quarter, SUM(registered_users) as user_count, SUM(appopen_count) as open_count
+                  FROM map_user GROUP BY year, quarter;""",
+               """SELECT year, quarter, SUM(transaction_count) as number_of_transactions, SUM(transaction_amount) as total_transaction_amount
+                  FROM aggregated_transaction GROUP BY year, quarter;""",
+               """SELECT year, quarter, SUM(insurance_count) AS count, SUM(insurance_amount) AS amount
+                  FROM aggregated_insurance GROUP BY year, quarter;"""]
+    user_trends, transaction_trends, insurance_trends = read_sql_many(queries, read_engine(), snapshot=True)
+
+    with col1:
         st.markdown("### Registered Users")
-        st.markdown(f"<h2 style='color: green;'> {value_formats(df.iloc[0,0])}+ 📈</h2>", unsafe_allow_html=True)
+        st.markdown(f"<h2 style='color: green;'> {value_formats(kpis.iloc[0]['total_users'])}+ 📈</h2>", unsafe_allow_html=True)
 
     with col2:
-        query = "SELECT SUM(transaction_count) AS total_trans FROM aggregated_transaction;"
-        df = pd.read_sql(query, engine)
-
         st.markdown("### Transactions")
-        st.markdown(f"<h2 style='color: green;'> {value_formats(df.iloc[0,0])}+ 📈</h2>", unsafe_allow_html=True)
+        st.markdown(f"<h2 style='color: green;'> {value_formats(kpis.iloc[0]['total_trans'])}+ 📈</h2>", unsafe_allow_html=True)
 
     with col3:
-        query = "SELECT SUM(insurance_count) AS total FROM map_insurance;"
-        df = pd.read_sql(query, engine)
-
         st.markdown("### Insurance Transactions")
-        st.markdown(f"<h2 style='color: green;'> {value_formats(df.iloc[0,0])}+ 📈</h2>", unsafe_allow_html=True)
+        st.markdown(f"<h2 style='color: green;'> {value_formats(kpis.iloc[0]['total_insurance'])}+ 📈</h2>", unsafe_allow_html=True)
     st.markdown("\n")
     st.markdown("<h4 style='color: blue;'> Phonepe User Registeration Trends </h4>", unsafe_allow_html=True)
     with st.container(height=500):
-        query = """ 
-                SELECT
-                    year,
-                    quarter,
-                    SUM(registered_users) as user_count,
-                    SUM(appopen_count) as open_count
-                FROM
-                    map_user
-                GROUP BY 
-                    year, quarter; 
-                    """
-        df = pd.read_sql(text(query), engine)
+        df = user_trends
         df['user_counts_f'] = df['user_count'].apply(value_formats)
         df['open_counts_f'] = df['open_count'].apply(value_formats)
 
@@ -201,18 +1445,7 @@ def main_page():
     st.markdown("\n")
     st.markdown("<h4 style='color: blue;'> Phonepe Transaction Trends </h4>", unsafe_allow_html=True)
     with st.container(height=500):
-        query = """ 
-                SELECT
-                    year,
-                    quarter,
-                    SUM(transaction_count) as number_of_transactions,
-                    SUM(transaction_amount) as total_transaction_amount
-                FROM
-                    aggregated_transaction
-                GROUP BY 
-                    year, quarter; 
-                    """
-        df = pd.read_sql(text(query), engine)
+        df = transaction_trends
         df['number_of_transactions_f'] = df['number_of_transactions'].apply(value_formats)
         df['total_transaction_amount_f'] = df['total_transaction_amount'].apply(value_formats)
 
@@ -231,9 +1464,7 @@ def main_page():
     st.markdown("\n")
     st.markdown("<h4 style='color: blue;'> Phonepe Insurance Trends </h4>", unsafe_allow_html=True)
     with st.container(height=500):
-        query = """SELECT year, quarter, SUM(insurance_count) AS count, SUM(insurance_amount) AS amount
-                    FROM aggregated_insurance GROUP BY year, quarter;"""
-        df = pd.read_sql(query, engine)
+        df = insurance_trends
 
         new_df = pd.DataFrame([{'year' : 2020, 'quarter' : 'Q1', 'count' : 0, 'amount' : 0}])
         df1 = pd.concat([new_df, df], ignore_index=True)
@@ -261,9 +1492,8 @@ def user_engage_analysis():
 
     query = """SELECT state, year, SUM(registered_users) as user_count, SUM(appopen_count) as open_count 
                 FROM map_user GROUP BY state, year ORDER BY user_count;"""
-    df = pd.read_sql(query, engine)
-    df['user_counts_f'] = df['user_count'].apply(value_formats)
-    df['open_counts_f'] = df['open_count'].apply(value_formats)
+    df = cached_frame("user.engagement.state_year", (),
+                      lambda: with_value_formats(read_sql(query, read_engine()), {'user_counts_f': 'user_count', 'open_counts_f': 'open_count'}))
 
     year_dict = {}
     for year in year_list():
@@ -286,55 +1516,52 @@ def user_engage_analysis():
                     st.markdown(f"<h5 style ='color: Green;'>App Open Count : {value_formats(df['open_count'].sum())}</h5>", unsafe_allow_html=True)
 
     with st.container(border=True):
-        fig = geo_choropleth_plot(df, 'state', 'user_count', "", 'year', None, None)
+        def build_map():
+            fig = geo_choropleth_plot(df.copy(), 'state', 'user_count', "", 'year', None, None)
 
-        initial_year = df[df['year'] == df['year'].max()]
-        fig.update_traces(customdata = initial_year[['state', 'year', 'user_counts_f', 'open_counts_f']].values,
-                        hovertemplate="Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Registered Users : %{customdata[2]}<br>Appopen Count : %{customdata[3]}<extra></extra>")
-        
-        for frame in fig.frames:
-            frame_df = df[df['year'] == int(frame.name)]
-            frame.data[0].customdata = frame_df[['state', 'year', 'user_counts_f', 'open_counts_f']].values
-            frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Registered Users : %{customdata[2]}<br>Appopen Count :  %{customdata[3]}<extra></extra>")
-                
-        st.plotly_chart(fig, use_container_width=True)
+            initial_year = df[df['year'] == df['year'].max()]
+            fig.update_traces(customdata = initial_year[['state', 'year', 'user_counts_f', 'open_counts_f']].values,
+                            hovertemplate="Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Registered Users : %{customdata[2]}<br>Appopen Count : %{customdata[3]}<extra></extra>")
 
-        df1 = df.groupby(['state', 'year'])[['user_count', 'open_count']].sum().reset_index()
-        df1['user_counts_f'] = df1['user_count'].apply(value_formats)
-        df1['open_counts_f'] = df1['open_count'].apply(value_formats)
-
-        p_df1 = df1.pivot_table(index='year', columns='state', values='user_count')
-        c = df1.pivot_table(index='year', columns='state', values='user_counts_f', aggfunc='first')
-        a = df1.pivot_table(index='year', columns='state', values='open_counts_f', aggfunc='first')
-        zmin = p_df1.values.min()
-        zmax = p_df1.values.max()
-        custom_data = np.dstack((c.values, a.values))
-        fig = go.Figure(data=go.Heatmap(x=p_df1.columns,
-                                        y=p_df1.index,
-                                        z=p_df1.values,
-                                        colorscale='Blues',
-                                        customdata=custom_data,
-                                        hovertemplate="State : %{x}"+
-                                                "<br>Year : %{y}"+
-                                                "<br>Registered User Count: %{customdata[0]}"+
-                                                "<br>App Open Count: %{customdata[1]}<extra></extra>",
-                                        zmin=zmin, zmax=zmax))
-        fig.update_layout(height=400,
-                            width=400,
-                            xaxis_tickangle=-45,
-                            margin=dict(t=0,b=0))
-        st.plotly_chart(fig, use_container_width=True)
+            for frame in fig.frames:
+                frame_df = df[df['year'] == int(frame.name)]
+                frame.data[0].customdata = frame_df[['state', 'year', 'user_counts_f', 'open_counts_f']].values
+                frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Registered Users : %{customdata[2]}<br>Appopen Count :  %{customdata[3]}<extra></extra>")
+            return fig
+
+        choropleth_by_period("user.engagement.state_map", (), df, 'user_count', 'year', build_map,
+                             ['state', 'year', 'user_counts_f', 'open_counts_f'],
+                             "Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Registered Users : %{customdata[2]}<br>Appopen Count : %{customdata[3]}<extra></extra>")
+
+        def build_heatmap():
+            df1 = df.groupby(['state', 'year'])[['user_count', 'open_count']].sum().reset_index()
+            df1['user_counts_f'] = value_formats_array(df1['user_count'])
+            df1['open_counts_f'] = value_formats_array(df1['open_count'])
+
+            fig = heatmap_figure(heatmap_data(df1, 'year', 'state', 'user_count', ['user_count', 'open_count']),
+                                 'Blues',
+                                 "State : %{x}"+
+                                     "<br>Year : %{y}"+
+                                     "<br>Registered User Count: %{customdata[0]}"+
+                                     "<br>App Open Count: %{customdata[1]}<extra></extra>",
+                                 height=400,
+                                 width=400,
+                                 xaxis_tickangle=-45,
+                                 margin=dict(t=0,b=0))
+            return fig
+        st.plotly_chart(cached_figure("user.engagement.state_year_heatmap", (), build_heatmap), use_container_width=True)
         #with st.expander("Detailed Info of Users and App Open Volume"):
             #st.dataframe(df1)
 
     with st.expander("Detailed Info of Registered Users Data"):
             st.dataframe(df)
+    export_links("user.engagement", {})
 
     st.markdown("<h3 style='color: blue;'>Device Dominance Distribution</h3>", unsafe_allow_html=True)
 
     col1, col2 = st.columns([0.3, 0.7])
     query = """SELECT brand, SUM(user_count) as user_count FROM aggregated_user GROUP BY brand ORDER BY user_count ASC;"""
-    df = pd.read_sql(query, engine)
+    df = read_sql(query, read_engine())
     with col1.container(border=True):
         st.markdown("<h4 style ='color: Skyblue;'> Brands</h4>", unsafe_allow_html=True)
         fig = px.bar(df, x='user_count', y='brand')
@@ -343,41 +1570,29 @@ def user_engage_analysis():
         with st.expander(f"Detailed info on brand usage"):
             st.dataframe(df)
 
-    query = """SELECT state, brand, year, quarter, user_count FROM aggregated_user WHERE year!= 2022 GROUP BY state, brand, year, quarter;"""
-    with engine.connect() as conn:
-        conn.execute(text("SET SESSION sql_mode = (SELECT REPLACE(@@sql_mode, 'ONLY_FULL_GROUP_BY', ''))"))
-        df = pd.read_sql(query, conn)
-    df['count'] = df['user_count'].apply(value_formats)
-    df1 = df.groupby(['state', 'year', 'brand'])[['user_count']].sum().reset_index()
-    df1['count_f'] = df1['user_count'].apply(value_formats)
-    brands = df['brand'].unique()
+    brand_years = [year for year in year_list() if year != 2022]
+    brands = compiled_frame([], ["brand"], {"year": brand_years})['brand'].tolist()
     selected_brand = st.sidebar.selectbox("Choose Brand:",brands)
 
-    df2 = df1[df1["brand"] == selected_brand]
+    df2 = compiled_frame(["user_count"], ["state", "year", "brand"], {"year": brand_years, "brand": selected_brand})
+    df2['count_f'] = value_formats_array(df2['user_count'])
     with col2.container(border=True):
         st.markdown(f"<h4 style ='color: Skyblue;'>Yearly and State-wise Trends for {selected_brand} Brand</h4>", unsafe_allow_html=True)
-        pivot_df = df2.pivot_table(index='year', columns='state', values='user_count')
-        c = df2.pivot_table(index='year', columns='state', values='count_f', aggfunc='first')
-        b = df2.pivot_table(index='year', columns='state', values='brand', aggfunc='first')
-        zmin = pivot_df.values.min()
-        zmax = pivot_df.values.max()
-        custom_data = np.dstack((c.values, b.values))
-        fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                        y=pivot_df.index,
-                                        z=pivot_df.values,
-                                        colorscale='Blues',
-                                        customdata=custom_data,
-                                        hovertemplate="State : %{x}"+
-                                                "<br>Year : %{y}"+
-                                                "<br>Brand : %{customdata[1]}"+
-                                                "<br>User Count: %{customdata[0]}<extra></extra>",
-                                                zmin=zmin, zmax=zmax))
-        fig.update_layout(width=400,
-                        xaxis_tickangle=-45,
-                        margin=dict(t=0,b=0,l=0,r=0))
-        st.plotly_chart(fig, use_container_width=True)
+        def build_heatmap():
+            fig = heatmap_figure(heatmap_data(df2, 'year', 'state', 'user_count', ['user_count'], ['brand']),
+                                 'Blues',
+                                 "State : %{x}"+
+                                     "<br>Year : %{y}"+
+                                     "<br>Brand : %{customdata[1]}"+
+                                     "<br>User Count: %{customdata[0]}<extra></extra>",
+                                 width=400,
+                                 xaxis_tickangle=-45,
+                                 margin=dict(t=0,b=0,l=0,r=0))
+            return fig
+        st.plotly_chart(cached_figure("user.engagement.brand_heatmap", (selected_brand,), build_heatmap), use_container_width=True)
         with st.expander(f"Detailed info on {selected_brand}"):
             st.dataframe(df2)
+        export_links("user.devices", {"brand": selected_brand})
 
     st.markdown(f"<h4 style ='color: Skyblue;'>App Open Rate Trend by {selected_brand} Brand</h4>", unsafe_allow_html=True)
     query = """WITH brand_usage AS (
@@ -394,7 +1609,7 @@ def user_engage_analysis():
                 FROM brand_usage agg
                 JOIN app_usage map
                 ON agg.state = map.state AND agg.year = map.year;"""
-    df = pd.read_sql(query, engine)
+    df = read_sql(query, read_engine())
     df1 = df[df['brand'] == f"{selected_brand}"]
     with st.container(border=True):
         fig = px.bar(df1, x='state', y='app_open_rate',color='year', barmode='group')
@@ -427,53 +1642,25 @@ def user_engage_analysis():
 def user_reg_analysis():
     st.markdown("<h3 style='color: blue;'>User Registration Analysis</h3>", unsafe_allow_html=True)
     # -------------------- GEO BUBBLE MAP -------------------- # 
-    query1 = """CREATE TEMPORARY TABLE agg_users_info AS 
-                SELECT state, district, SUM(registered_users) AS users
-                FROM top_user_districtwise GROUP BY state, district;"""
-    query2 = """SELECT u.state, u.district, u.users, l.longitude, l.latitude
-                FROM agg_users_info AS u INNER JOIN state_level_location_metrics AS l
-                ON u.state = l.state AND u.district = l.district GROUP BY u.state, u.district;"""
-    
-    with engine.connect() as conn:
-        conn.execute(text(query1))
-        df = pd.read_sql(query2, conn)    
-
-    df['users_f'] = df['users'].apply(value_formats)
+    index = district_user_index(data_version())
+    df = index.df
+    focus_options = ["None"] + sorted(f"{district}, {state}" for state, district in zip(df['state'], df['district']))
+    selected_focus = st.sidebar.selectbox("Focus District: ", focus_options)
+    center = {"lat": 22.9734, "lon": 78.6569}
+    if selected_focus != "None":
+        focus = df[df['district'] + ", " + df['state'] == selected_focus].iloc[0]
+        center = {"lat": focus['latitude'], "lon": focus['longitude']}
+    selected_zoom = st.sidebar.select_slider("Map Zoom: ", MAP_ZOOM_LEVELS, value=4 if selected_focus == "None" else 7)
+    df = index.bbox(*map_viewport(center, selected_zoom))
+    points = cluster_points(df, 'users', selected_zoom, ['state', 'district'])
+    points['users_f'] = value_formats_array(points['users'])
     with st.container(border=True):
-        # Setting India States as background map
-        with open("india_states.geojson") as f:
-            india_geojson = json.load(f)
-        state_names = [feature["properties"]["ST_NM"] for feature in india_geojson["features"]]
-        fig = go.Figure()
-        fig.add_trace(go.Choroplethmapbox(
-                    geojson=india_geojson,
-                    locations=state_names,
-                    z=[0]*len(state_names),
-                    featureidkey="properties.ST_NM",
-                    colorscale=[[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
-                    showscale=False,
-                    marker_line_color='white',
-                    marker_line_width=0.5))
-        
-        # Plotting Bubbles on top
-        min_size = 5
-        max_size = 50
-        print(df.head)
-        # Normalize users to marker sizes between 5 and 30
-        size_scaled = np.interp(df['users'], (df['users'].min(), df['users'].max()), (min_size, max_size))
-        fig.add_trace(go.Scattermapbox(lon=df['longitude'],
-            lat=df['latitude'],
-            mode="markers",
-            marker=dict(size=size_scaled,
-                color="#8D14FF",
-                opacity=0.6),
-            customdata=df[['state', 'district', 'users_f', 'latitude', 'longitude']],
-            hovertemplate="<b>State: %{customdata[0]}</b><br>District: %{customdata[1]}<br>Users: %{customdata[2]}<br>Latitude: %{customdata[3]}<br>Longitude: %{customdata[4]}<extra></extra>"))
-
-        fig.update_layout(mapbox=dict(style="carto-darkmatter",center={"lat": 22.9734, "lon": 78.6569},zoom=4,),
-                        margin={"r":0,"t":0,"l":0,"b":0})
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(district_bubble_figure(points, center, selected_zoom), use_container_width=True)
         
+        if selected_focus != "None":
+            with st.expander(f"Nearest Districts to {selected_focus}"):
+                nearest = index.nearest(focus['latitude'], focus['longitude'], 6).iloc[1:]
+                st.dataframe(nearest[['state', 'district', 'users_f', 'distance_km']].round({'distance_km': 1}), hide_index=True)
         with st.expander(f"Detailed Info"):
             st.dataframe(df)
 
@@ -483,27 +1670,8 @@ def user_reg_analysis():
     selected_quarter = st.sidebar.selectbox("Choose Quarter: ", quarter_list()+["All"])
     st.markdown(f"<h4 style ='color: Skyblue;'>Statewise - Top Registered Users [Year-({selected_year}) & Quarter-({selected_quarter})]</h4>", unsafe_allow_html=True)
 
-    if selected_year == "All" and selected_quarter != "All":
-        query = f""" SELECT state, year, quarter, SUM(registered_users) as users
-                FROM map_user WHERE quarter='{selected_quarter}'
-                GROUP BY state, year, quarter ORDER BY users DESC LIMIT 25;"""
-    elif selected_year != "All" and selected_quarter == "All":
-        query = f""" SELECT state, year, quarter, SUM(registered_users) as users
-                FROM map_user WHERE year={selected_year}
-                GROUP BY state, year, quarter  ORDER BY users DESC LIMIT 25;"""
-    elif selected_year == "All" and selected_quarter == "All":
-        query = f""" SELECT state, SUM(registered_users) as users
-                FROM map_user
-                GROUP BY state ORDER BY users DESC LIMIT 15;"""
-    else:
-        query = f""" SELECT state, year, quarter, SUM(registered_users) as users
-                FROM map_user WHERE year={selected_year} AND quarter='{selected_quarter}'
-                GROUP BY state, year, quarter ORDER BY users DESC LIMIT 15;"""
-    with engine.connect() as conn:
-        conn.execute(text("SET SESSION sql_mode = (SELECT REPLACE(@@sql_mode, 'ONLY_FULL_GROUP_BY', ''))"))
-        df = pd.read_sql(query, conn)
-    
-    df['users_f'] = df['users'].apply(value_formats)
+    by_period = (selected_year == "All") != (selected_quarter == "All")
+    df = leaderboard('registered_users', 'state', selected_year, selected_quarter, 'top', 25 if by_period else 15, 'users', by_period)
     with st.container(border=True):
         df_top_states = df.sort_values(by='users', ascending=True)
         fig = px.bar(df_top_states, x='users', y='state', orientation='h', color='users', color_continuous_scale='MAGMA', text_auto=True)
@@ -526,28 +1694,8 @@ def user_reg_analysis():
     
     st.markdown(f"<h4 style ='color: Skyblue;'>Districtwise - Top Registered Users [Year-({selected_year}) & Quarter-({selected_quarter})]</h4>", unsafe_allow_html=True)
 
-    if selected_year == "All" and selected_quarter != "All":
-        query = f"""SELECT state, district, year, quarter, SUM(registered_users) as users
-                    FROM top_user_districtwise WHERE quarter='{selected_quarter}'
-                    GROUP BY district, year, quarter ORDER BY users DESC LIMIT 40;"""
-    elif selected_year != "All" and selected_quarter == "All":
-        query = f"""SELECT state, district, year, quarter, SUM(registered_users) as users
-                    FROM top_user_districtwise WHERE year='{selected_year}'
-                    GROUP BY district, year, quarter ORDER BY users DESC LIMIT 40;"""
-    elif selected_year == "All" and selected_quarter == "All":
-        query = f"""SELECT state, district, SUM(registered_users) as users
-                    FROM top_user_districtwise
-                    GROUP BY district ORDER BY users DESC LIMIT 15;"""
-    else:
-        query = f"""SELECT state, district, year, quarter, SUM(registered_users) as users
-                    FROM top_user_districtwise WHERE year='{selected_year}' AND quarter='{selected_quarter}'
-                    GROUP BY district, year, quarter ORDER BY users DESC LIMIT 15;"""
-        
-    with engine.connect() as conn:
-        conn.execute(text("SET SESSION sql_mode = (SELECT REPLACE(@@sql_mode, 'ONLY_FULL_GROUP_BY', ''))"))
-        df = pd.read_sql(query, conn)
-    
-    df['users_f'] = df['users'].apply(value_formats)
+    by_period = (selected_year == "All") != (selected_quarter == "All")
+    df = leaderboard('registered_users', 'district', selected_year, selected_quarter, 'top', 40 if by_period else 15, 'users', by_period)
     with st.container(border=True):
         df_top_districts = df.sort_values(by='users', ascending=True)
         fig = px.bar(df_top_districts, x='users', y='district', orientation='h', color='users', color_continuous_scale='sunsetdark', text_auto=True)
@@ -572,29 +1720,9 @@ def user_reg_analysis():
     
     st.markdown(f"<h4 style ='color: Skyblue;'>Pincodewise - Top Registered Users [Year-({selected_year}) & Quarter-({selected_quarter})]</h4>", unsafe_allow_html=True)
 
-    if selected_year == "All" and selected_quarter != "All":
-        query = f"""SELECT state, pincode, year, quarter, SUM(registered_users) as users
-                    FROM top_user_pincodewise WHERE quarter='{selected_quarter}'
-                    GROUP BY pincode, year, quarter ORDER BY users DESC LIMIT 40;"""
-    elif selected_year != "All" and selected_quarter == "All":
-        query = f"""SELECT state, pincode, year, quarter, SUM(registered_users) as users
-                    FROM top_user_pincodewise WHERE year='{selected_year}'
-                    GROUP BY pincode, year, quarter ORDER BY users DESC LIMIT 40;"""
-    elif selected_year == "All" and selected_quarter == "All":
-        query = f"""SELECT state, pincode, SUM(registered_users) as users
-                    FROM top_user_pincodewise
-                    GROUP BY pincode ORDER BY users DESC LIMIT 15;"""
-    else:
-        query = f"""SELECT state, pincode, year, quarter, SUM(registered_users) as users
-                    FROM top_user_pincodewise WHERE year='{selected_year}' AND quarter='{selected_quarter}'
-                    GROUP BY pincode, year, quarter ORDER BY users DESC LIMIT 15;"""
-        
-    with engine.connect() as conn:
-        conn.execute(text("SET SESSION sql_mode = (SELECT REPLACE(@@sql_mode, 'ONLY_FULL_GROUP_BY', ''))"))
-        df = pd.read_sql(query, conn)
+    by_period = (selected_year == "All") != (selected_quarter == "All")
+    df = leaderboard('registered_users', 'pincode', selected_year, selected_quarter, 'top', 40 if by_period else 15, 'users', by_period)
 
-    df['pincode'] = df['pincode'].astype(str)
-    df['users_f'] = df['users'].apply(value_formats)
     with st.container(border=True):
         df_top_pincode = df.sort_values(by='users', ascending=True)
         fig = px.bar(df_top_pincode, x='users', y='pincode', orientation='h', color='users', color_continuous_scale='sunset', text_auto=True, text='users_f')
@@ -614,6 +1742,7 @@ def user_reg_analysis():
         st.plotly_chart(fig, use_container_width=True)
         with st.expander(f"Detailed Info on Top 15 Pincodes for Year({selected_year}) - Quarter({selected_quarter})"):
             st.dataframe(df)
+    export_links("user.registration", {"year": selected_year, "quarter": selected_quarter})
 
 
 def second_page():
@@ -626,19 +1755,18 @@ def second_page():
 
 # ----------------------------------------------  TRANSACTION PAGE -------------------------------------------- #
 
+PAYMENT_FORMATS = {'count': 'transaction_count', 'amount': 'transaction_amount'}
+
 def payment_mode_analysis():
     st.markdown("<h3 style ='color: blue;'>Transaction Dynamics based on State, Payment Types and Quarters over Years</h3>", unsafe_allow_html=True)
 
     selected_state = st.sidebar.selectbox("Choose State: ", ['All'] + state_list())
     selected_year = st.sidebar.selectbox("Choose Year: ", ['All'] + year_list())
     selected_quarter = st.sidebar.selectbox("Choose Quarter:", ['All'] + quarter_list())
+    df = compiled_frame(["transaction_count", "transaction_amount"], ["state", "year", "quarter", "transaction_type"],
+                        {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
 
     if selected_quarter == "All" and selected_year == "All" and selected_state == "All":
-        query = """SELECT * FROM aggregated_transaction;"""
-        df = pd.read_sql(query, engine)
-        df['count'] = df['transaction_count'].apply(value_formats)
-        df['amount'] = df['transaction_amount'].apply(value_formats)
-
         count_sum = value_formats(df['transaction_count'].sum())
         amount_sum = value_formats(df['transaction_amount'].sum())
         st.markdown("<h4 style ='color: Skyblue;'> India - Overall Transaction Behaviour</h4>", unsafe_allow_html=True)
@@ -664,80 +1792,69 @@ def payment_mode_analysis():
                         st.markdown(f"<h5 style ='color: Green;'>Transaction Amount : ₹ {amount_sum}</h5>", unsafe_allow_html=True)
 
         with st.container(border=True):         
-            fig = geo_choropleth_plot(df, 'state', 'transaction_count', "", 'year', None, None)
-
-            initial_year = df[df['year'] == df['year'].min()]
-            fig.update_traces(customdata = initial_year[['state', 'year', 'count', 'amount']].values,
-                        hovertemplate="Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
-        
-            for frame in fig.frames:
-                frame_df = df[df['year'] == int(frame.name)]
-                frame.data[0].customdata = frame_df[['state', 'year', 'count', 'amount']].values
-                frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
-                
-            st.plotly_chart(fig, use_container_width=True)
-
-            df1 = df.groupby(['state', 'year'])[['transaction_count', 'transaction_amount']].sum().reset_index()
-            df1['count_s'] = df1['transaction_count'].apply(value_formats)
-            df1['amount_s'] = df1['transaction_amount'].apply(value_formats)
+            def build_map():
+                map_df = with_value_formats(df, PAYMENT_FORMATS)
+                fig = geo_choropleth_plot(map_df, 'state', 'transaction_count', "", 'year', None, None)
+
+                initial_year = map_df[map_df['year'] == map_df['year'].min()]
+                fig.update_traces(customdata = initial_year[['state', 'year', 'count', 'amount']].values,
+                            hovertemplate="Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
+
+                for frame in fig.frames:
+                    frame_df = map_df[map_df['year'] == int(frame.name)]
+                    frame.data[0].customdata = frame_df[['state', 'year', 'count', 'amount']].values
+                    frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
+                return fig
+
+            choropleth_by_period("transaction.payment_mode.state_map", (selected_state, selected_year, selected_quarter), df, 'transaction_count', 'year', build_map,
+                                 ['state', 'year', 'count', 'amount'],
+                                 "Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>",
+                                 PAYMENT_FORMATS)
+
+            def build_totals():
+                df1 = df.groupby(['state', 'year'])[['transaction_count', 'transaction_amount']].sum().reset_index()
+                df1['count_s'] = value_formats_array(df1['transaction_count'])
+                df1['amount_s'] = value_formats_array(df1['transaction_amount'])
+                return df1
+            df1 = cached_frame("transaction.payment_mode.period_totals", (selected_state, selected_year, selected_quarter), build_totals)
             
-            p_df1 = df1.pivot_table(index='year', columns='state', values='transaction_count')
-            c = df1.pivot_table(index='year', columns='state', values='count_s', aggfunc='first')
-            a = df1.pivot_table(index='year', columns='state', values='amount_s', aggfunc='first')
-            zmin = p_df1.values.min()
-            zmax = p_df1.values.max()
-            custom_data = np.dstack((c.values, a.values))
-            fig = go.Figure(data=go.Heatmap(x=p_df1.columns,
-                                            y=p_df1.index,
-                                            z=p_df1.values,
-                                            colorscale='RdBu',
-                                            customdata=custom_data,
-                                            hovertemplate="State : %{x}"+
-                                                "<br>Year : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(height=500,
-                              width=400,
-                              xaxis_tickangle=-45,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df1, 'year', 'state', 'transaction_count', ['transaction_count', 'transaction_amount']),
+                                     'RdBu',
+                                     "State : %{x}"+
+                                         "<br>Year : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=500,
+                                     width=400,
+                                     xaxis_tickangle=-45,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.period_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
             with st.expander("Detailed Info of Yearly Transaction Count behaviour"):
                 st.dataframe(df1)
 
         st.markdown("<h4 style ='color: skyblue;'> India - Overall Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
 
         with st.container(border=True):
-            pivot_df = df.pivot_table(index='transaction_type', columns='state', values='transaction_count')
-            c = df.pivot_table(index='transaction_type', columns='state', values='count', aggfunc='first')
-            a = df.pivot_table(index='transaction_type', columns='state', values='amount', aggfunc='first')
-            zmin = pivot_df.values.min()
-            zmax = pivot_df.values.max()
-            custom_data = np.dstack((c.values, a.values))
-            fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                            y=pivot_df.index,
-                                            z=pivot_df.values,
-                                            colorscale='YlOrRd',
-                                            customdata=custom_data,
-                                            hovertemplate="State : %{x}"+
-                                                "<br>Type : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(height=500,
-                              width=400,
-                              xaxis_tickangle=-45,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df, 'transaction_type', 'state', 'transaction_count', ['transaction_count', 'transaction_amount']),
+                                     'YlOrRd',
+                                     "State : %{x}"+
+                                         "<br>Type : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=500,
+                                     width=400,
+                                     xaxis_tickangle=-45,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.type_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
 
         with st.expander("Detailed Info of Regionwise Transaction Count behaviour"):
-            st.dataframe(df)
+            detail_table("transaction.payment_mode.detail", "aggregated_transaction",
+                         {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
     elif selected_quarter == "All" and selected_year != "All" and selected_state == "All":
-        query = f"""SELECT * FROM aggregated_transaction WHERE year={selected_year};"""
-        df = pd.read_sql(query, engine)
-        df['count'] = df['transaction_count'].apply(value_formats)
-        df['amount'] = df['transaction_amount'].apply(value_formats)
-
         count_sum = value_formats(df['transaction_count'].sum())
         amount_sum = value_formats(df['transaction_amount'].sum())
 
@@ -763,82 +1880,69 @@ def payment_mode_analysis():
                         st.markdown(f"<h5 style ='color: Green;'>Transaction Count: {count_sum}</h5>", unsafe_allow_html=True)
                         st.markdown(f"<h5 style ='color: Green;'>Transaction Amount : ₹ {amount_sum}</h5>", unsafe_allow_html=True)
         with st.container(border=True):
-            fig = geo_choropleth_plot(df, 'state', 'transaction_count', "", 'quarter', None, None)
-            ig = geo_choropleth_plot(df, 'state', 'transaction_count', "", 'quarter', None, None)
-
-            initial_year = df[df['quarter'] == "Q4"]
-            fig.update_traces(customdata = initial_year[['state', 'year', 'quarter', 'count', 'amount']].values,
-                        hovertemplate="Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-        
-            for frame in fig.frames:
-                frame_df = df[df['quarter'] == frame.name]
-                frame.data[0].customdata = frame_df[['state', 'year', 'quarter', 'count', 'amount']].values
-                frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-                
-            st.plotly_chart(fig, use_container_width=True)
-
-            df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
-            df1['count_s'] = df1['transaction_count'].apply(value_formats)
-            df1['amount_s'] = df1['transaction_amount'].apply(value_formats)
+            def build_map():
+                map_df = with_value_formats(df, PAYMENT_FORMATS)
+                fig = geo_choropleth_plot(map_df, 'state', 'transaction_count', "", 'quarter', None, None)
+
+                initial_year = map_df[map_df['quarter'] == "Q4"]
+                fig.update_traces(customdata = initial_year[['state', 'year', 'quarter', 'count', 'amount']].values,
+                            hovertemplate="Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+
+                for frame in fig.frames:
+                    frame_df = map_df[map_df['quarter'] == frame.name]
+                    frame.data[0].customdata = frame_df[['state', 'year', 'quarter', 'count', 'amount']].values
+                    frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+                return fig
+
+            choropleth_by_period("transaction.payment_mode.state_map", (selected_state, selected_year, selected_quarter), df, 'transaction_count', 'quarter', build_map,
+                                 ['state', 'year', 'quarter', 'count', 'amount'],
+                                 "Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>",
+                                 PAYMENT_FORMATS)
+
+            def build_totals():
+                df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
+                df1['count_s'] = value_formats_array(df1['transaction_count'])
+                df1['amount_s'] = value_formats_array(df1['transaction_amount'])
+                return df1
+            df1 = cached_frame("transaction.payment_mode.period_totals", (selected_state, selected_year, selected_quarter), build_totals)
             
-            p_df1 = df1.pivot_table(index='quarter', columns='state', values='transaction_count')
-            c = df1.pivot_table(index='quarter', columns='state', values='count_s', aggfunc='first')
-            a = df1.pivot_table(index='quarter', columns='state', values='amount_s', aggfunc='first')
-            zmin = p_df1.values.min()
-            zmax = p_df1.values.max()
-            custom_data = np.dstack((c.values, a.values))
-            fig = go.Figure(data=go.Heatmap(x=p_df1.columns,
-                                            y=p_df1.index,
-                                            z=p_df1.values,
-                                            colorscale='RdBu',
-                                            customdata=custom_data,
-                                            hovertemplate="State : %{x}"+
-                                                "<br>Quarter : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(height=500,
-                              width=400,
-                              xaxis_tickangle=-45,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df1, 'quarter', 'state', 'transaction_count', ['transaction_count', 'transaction_amount']),
+                                     'RdBu',
+                                     "State : %{x}"+
+                                         "<br>Quarter : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=500,
+                                     width=400,
+                                     xaxis_tickangle=-45,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.period_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
             with st.expander(f"Detailed Info of {selected_year} Quarterly Transaction Count behaviour"):
                 st.dataframe(df1)
 
         st.markdown(f"<h4 style ='color: skyblue;'> India - {selected_year} Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
 
         with st.container(border=True):
-            pivot_df = df.pivot_table(index='transaction_type', columns='state', values='transaction_count')
-            c = df.pivot_table(index='transaction_type', columns='state', values='count', aggfunc='first')
-            a = df.pivot_table(index='transaction_type', columns='state', values='amount', aggfunc='first')
-            year = df.pivot_table(index='transaction_type', columns='state', values='year', aggfunc='first')
-            zmin = pivot_df.values.min()
-            zmax = pivot_df.values.max()
-            custom_data = np.dstack((c.values, a.values, year.values))
-            fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                            y=pivot_df.index,
-                                            z=pivot_df.values,
-                                            colorscale='YlOrRd',
-                                            customdata=custom_data,
-                                            hovertemplate="State : %{x}"+
-                                                "<br>Year : %{customdata[2]}" +
-                                                "<br>Type : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(height=500,
-                              width=400,
-                              xaxis_tickangle=-45,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df, 'transaction_type', 'state', 'transaction_count', ['transaction_count', 'transaction_amount'], ['year']),
+                                     'YlOrRd',
+                                     "State : %{x}"+
+                                         "<br>Year : %{customdata[2]}" +
+                                         "<br>Type : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=500,
+                                     width=400,
+                                     xaxis_tickangle=-45,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.type_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
         with st.expander(f"Detailed Info on {selected_state} Overall {selected_quarter}"):
-            st.dataframe(df)
+            detail_table("transaction.payment_mode.detail", "aggregated_transaction",
+                         {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
     elif selected_quarter != "All" and selected_year == "All" and selected_state == "All":
-        query = f"""SELECT * FROM aggregated_transaction WHERE quarter='{selected_quarter}';"""
-        df = pd.read_sql(query, engine)
-        df['count'] = df['transaction_count'].apply(value_formats)
-        df['amount'] = df['transaction_amount'].apply(value_formats)
-
         count_sum = value_formats(df['transaction_count'].sum())
         amount_sum = value_formats(df['transaction_amount'].sum())
         st.markdown(f"<h4 style ='color: skyblue;'> India - Overall {selected_quarter} Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
@@ -864,43 +1968,44 @@ def payment_mode_analysis():
                         st.markdown(f"<h5 style ='color: Green;'>Transaction Amount : ₹ {amount_sum}</h5>", unsafe_allow_html=True)
 
         with st.container(border=True):
-            fig = geo_choropleth_plot(df, 'state', 'transaction_count', "", 'year', None, None)
-            initial_year = df[df['year'] == df['year'].max()]
-            fig.update_traces(customdata = initial_year[['state', 'year', 'quarter', 'count', 'amount']].values,
-                        hovertemplate="Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-                
-            for frame in fig.frames:
-                frame_df = df[df['year'] == int(frame.name)]
-                frame.data[0].customdata = frame_df[['state', 'year', 'quarter', 'count', 'amount']].values
-                frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-                
-            st.plotly_chart(fig, use_container_width=True)
-
-            df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
-            df1['count_s'] = df1['transaction_count'].apply(value_formats)
-            df1['amount_s'] = df1['transaction_amount'].apply(value_formats)
+            def build_map():
+                map_df = with_value_formats(df, PAYMENT_FORMATS)
+                fig = geo_choropleth_plot(map_df, 'state', 'transaction_count', "", 'year', None, None)
+                initial_year = map_df[map_df['year'] == map_df['year'].max()]
+                fig.update_traces(customdata = initial_year[['state', 'year', 'quarter', 'count', 'amount']].values,
+                            hovertemplate="Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+
+                for frame in fig.frames:
+                    frame_df = map_df[map_df['year'] == int(frame.name)]
+                    frame.data[0].customdata = frame_df[['state', 'year', 'quarter', 'count', 'amount']].values
+                    frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+                return fig
+
+            choropleth_by_period("transaction.payment_mode.state_map", (selected_state, selected_year, selected_quarter), df, 'transaction_count', 'year', build_map,
+                                 ['state', 'year', 'quarter', 'count', 'amount'],
+                                 "Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>",
+                                 PAYMENT_FORMATS)
+
+            def build_totals():
+                df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
+                df1['count_s'] = value_formats_array(df1['transaction_count'])
+                df1['amount_s'] = value_formats_array(df1['transaction_amount'])
+                return df1
+            df1 = cached_frame("transaction.payment_mode.period_totals", (selected_state, selected_year, selected_quarter), build_totals)
             
-            p_df1 = df1.pivot_table(index='year', columns='state', values='transaction_count')
-            c = df1.pivot_table(index='year', columns='state', values='count_s', aggfunc='first')
-            a = df1.pivot_table(index='year', columns='state', values='amount_s', aggfunc='first')
-            zmin = p_df1.values.min()
-            zmax = p_df1.values.max()
-            custom_data = np.dstack((c.values, a.values))
-            fig = go.Figure(data=go.Heatmap(x=p_df1.columns,
-                                            y=p_df1.index,
-                                            z=p_df1.values,
-                                            colorscale='blues',
-                                            customdata=custom_data,
-                                            hovertemplate="State : %{x}"+
-                                                "<br>Year : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(height=500,
-                              width=400,
-                              xaxis_tickangle=-45,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df1, 'year', 'state', 'transaction_count', ['transaction_count', 'transaction_amount']),
+                                     'blues',
+                                     "State : %{x}"+
+                                         "<br>Year : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=500,
+                                     width=400,
+                                     xaxis_tickangle=-45,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.period_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
             with st.expander(f"Detailed Info of Yearly {selected_quarter} Transaction behaviour"):
                 st.dataframe(df1)
 
@@ -908,37 +2013,25 @@ def payment_mode_analysis():
 
         with st.container(border=True):
             st.caption(f"{selected_state} (Overall {selected_quarter}) - Payment Categorywise Transaction")
-            pivot_df = df.pivot_table(index='transaction_type', columns='state', values='transaction_count')
-            c = df.pivot_table(index='transaction_type', columns='state', values='count', aggfunc='first')
-            a = df.pivot_table(index='transaction_type', columns='state', values='amount', aggfunc='first')
-            q = df.pivot_table(index='transaction_type', columns='state', values='quarter', aggfunc='first')
-
-            custom_data = np.dstack((c.values, a.values, q.values))
-            fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                            y=pivot_df.index,
-                                            z=pivot_df.values,
-                                            colorscale='YlOrRd',
-                                            customdata=custom_data,
-                                            hovertemplate="State : %{x}"+
-                                                "<br>Quarter : %{customdata[2]}" +
-                                                "<br>Type : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>"))
-            fig.update_layout(height=500,
-                              width=400,
-                              xaxis_tickangle=-45,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df, 'transaction_type', 'state', 'transaction_count', ['transaction_count', 'transaction_amount'], ['quarter']),
+                                     'YlOrRd',
+                                     "State : %{x}"+
+                                         "<br>Quarter : %{customdata[2]}" +
+                                         "<br>Type : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=500,
+                                     width=400,
+                                     xaxis_tickangle=-45,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.type_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
         with st.expander(f"Detailed Info on {selected_state} Overall {selected_quarter}"):
-            st.dataframe(df)
+            detail_table("transaction.payment_mode.detail", "aggregated_transaction",
+                         {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
 
     elif selected_quarter != "All" and selected_year != "All" and selected_state == "All":
-        query = f"""SELECT * FROM aggregated_transaction 
-                    WHERE quarter='{selected_quarter}' and year={selected_year};"""
-        df = pd.read_sql(query, engine)
-        df['count'] = df['transaction_count'].apply(value_formats)
-        df['amount'] = df['transaction_amount'].apply(value_formats)
-
         count_sum = value_formats(df['transaction_count'].sum())
         amount_sum = value_formats(df['transaction_amount'].sum())
         st.markdown(f"<h4 style ='color: skyblue;'> India - {selected_year}({selected_quarter}) Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
@@ -947,73 +2040,62 @@ def payment_mode_analysis():
             st.markdown(f"<h5 style ='color: Green;'>Transaction Count: {count_sum}</h5>", unsafe_allow_html=True)
             st.markdown(f"<h5 style ='color: Green;'>Transaction Amount : ₹ {amount_sum}</h5>", unsafe_allow_html=True)
         with st.container(border=True):
-            fig = geo_choropleth_plot(df, 'state', 'transaction_count', "", None, None, None)
-            fig.update_traces(customdata = np.stack((df['state'], df['quarter'], df['count'], df['amount'], df['year']), axis=1),
-                            hovertemplate="State : %{customdata[0]}<br>"\
-                                        "Year : %{customdata[4]}<br>"\
-                                        "Quarter : %{customdata[1]}<br>"\
-                                        "Transaction Count : %{customdata[2]}<br>"\
-                                        "Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
-            st.plotly_chart(fig)
-            df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
-            df1['count_s'] = df1['transaction_count'].apply(value_formats)
-            df1['amount_s'] = df1['transaction_amount'].apply(value_formats)
+            def build_map():
+                map_df = with_value_formats(df, PAYMENT_FORMATS)
+                fig = geo_choropleth_plot(map_df, 'state', 'transaction_count', "", None, None, None)
+                fig.update_traces(customdata = np.stack((map_df['state'], map_df['quarter'], map_df['count'], map_df['amount'], map_df['year']), axis=1),
+                                hovertemplate="State : %{customdata[0]}<br>"\
+                                            "Year : %{customdata[4]}<br>"\
+                                            "Quarter : %{customdata[1]}<br>"\
+                                            "Transaction Count : %{customdata[2]}<br>"\
+                                            "Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
+                return fig
+
+            st.plotly_chart(cached_figure("transaction.payment_mode.state_map", (selected_state, selected_year, selected_quarter), build_map))
+            def build_totals():
+                df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
+                df1['count_s'] = value_formats_array(df1['transaction_count'])
+                df1['amount_s'] = value_formats_array(df1['transaction_amount'])
+                return df1
+            df1 = cached_frame("transaction.payment_mode.period_totals", (selected_state, selected_year, selected_quarter), build_totals)
             
-            p_df1 = df1.pivot_table(index='quarter', columns='state', values='transaction_count')
-            c = df1.pivot_table(index='quarter', columns='state', values='count_s', aggfunc='first')
-            a = df1.pivot_table(index='quarter', columns='state', values='amount_s', aggfunc='first')
-            zmin = p_df1.values.min()
-            zmax = p_df1.values.max()
-            custom_data = np.dstack((c.values, a.values))
-            fig = go.Figure(data=go.Heatmap(x=p_df1.columns,
-                                            y=p_df1.index,
-                                            z=p_df1.values,
-                                            colorscale='RdBu',
-                                            customdata=custom_data,
-                                            hovertemplate="State : %{x}"+
-                                                "<br>Quarter : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(yaxis_title=f"{selected_year}",
-                              width=400,
-                              xaxis_tickangle=-45,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df1, 'quarter', 'state', 'transaction_count', ['transaction_count', 'transaction_amount']),
+                                     'RdBu',
+                                     "State : %{x}"+
+                                         "<br>Quarter : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     yaxis_title=f"{selected_year}",
+                                     width=400,
+                                     xaxis_tickangle=-45,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.period_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
             with st.expander(f"Detailed Info of {selected_year}({selected_quarter}) Transaction Count behaviour"):
                 st.dataframe(df1)
 
         st.markdown(f"<h4 style ='color: skyblue;'> India - {selected_year}({selected_quarter}) Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
         with st.container(border=True):
-            pivot_df = df.pivot_table(index='transaction_type', columns='state', values='transaction_count')
-            c = df.pivot_table(index='transaction_type', columns='state', values='count', aggfunc='first')
-            a = df.pivot_table(index='transaction_type', columns='state', values='amount', aggfunc='first')
-            q = df.pivot_table(index='transaction_type', columns='state', values='quarter', aggfunc='first')
-            y = df.pivot_table(index='transaction_type', columns='state', values='year', aggfunc='first')
-
-            custom_data = np.dstack((c.values, a.values, q.values, y.values))
-            fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                            y=pivot_df.index,
-                                            z=pivot_df.values,
-                                            colorscale='YlOrRd',
-                                            customdata=custom_data,
-                                            hovertemplate="State : %{x}"+
-                                                "<br>Year : %{customdata[3]}" +
-                                                "<br>Quarter : %{customdata[2]}" +
-                                                "<br>Type : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>"))
-            fig.update_layout(height=500,
-                              width=400,
-                              xaxis_tickangle=-45,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df, 'transaction_type', 'state', 'transaction_count', ['transaction_count', 'transaction_amount'], ['quarter', 'year']),
+                                     'YlOrRd',
+                                     "State : %{x}"+
+                                         "<br>Year : %{customdata[3]}" +
+                                         "<br>Quarter : %{customdata[2]}" +
+                                         "<br>Type : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=500,
+                                     width=400,
+                                     xaxis_tickangle=-45,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.type_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
         with st.expander(f"Detailed Info on {selected_state} ({selected_quarter})"):
-            st.dataframe(df)
+            detail_table("transaction.payment_mode.detail", "aggregated_transaction",
+                         {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
     elif selected_quarter != "All" and selected_year == "All" and selected_state != "All":
-        query = f"""SELECT * FROM aggregated_transaction
-                    WHERE state='{selected_state}' and quarter='{selected_quarter}'"""
-        df = pd.read_sql(query, engine)
         st.markdown(f"<h4 style ='color: skyblue;'> {selected_state} (Overall {selected_quarter}) - Transaction Behaviour</h4>", unsafe_allow_html=True)
 
         with st.popover(f"Gross {selected_quarter}"):
@@ -1021,82 +2103,65 @@ def payment_mode_analysis():
             st.markdown(f"<h5 style ='color: Green;'>Transaction Amount : ₹ {value_formats(df['transaction_amount'].sum())}</h5>", unsafe_allow_html=True)
         with st.container(border=True):
 
-            fig = geo_choropleth_plot_statewise(df, 'state', 'transaction_count', "", selected_state, 'year')
-            initial_year = df[df['year'] == df['year'].max()]
-            initial_year['count_sum_col'] = np.full(len(initial_year), value_formats(initial_year['transaction_count'].sum()))
-            initial_year['amount_sum_col'] = np.full(len(initial_year), value_formats(initial_year['transaction_amount'].sum()))
-            fig.update_traces(customdata = initial_year[['state', 'year', 'quarter', 'count_sum_col', 'amount_sum_col']].values,
-                        hovertemplate="Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-        
-            for frame in fig.frames:
-                frame_df = df[df['year'] == int(frame.name)]
-                frame_df['count_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_count'].sum()))
-                frame_df['amount_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_amount'].sum()))
-                frame.data[0].customdata = frame_df[['state', 'year', 'quarter', 'count_sum', 'amount_sum']].values
-                frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-                
-            st.plotly_chart(fig, use_container_width=True)
-
-            df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
-            df1['count_s'] = df1['transaction_count'].apply(value_formats)
-            df1['amount_s'] = df1['transaction_amount'].apply(value_formats)
-
-            p_df1 = df1.pivot_table(index='quarter', columns='year', values='transaction_count')
-            c = df1.pivot_table(index='quarter', columns='year', values='count_s', aggfunc='first')
-            a = df1.pivot_table(index='quarter', columns='year', values='amount_s', aggfunc='first')
-            zmin = p_df1.values.min()
-            zmax = p_df1.values.max()
-            custom_data = np.dstack((c.values, a.values))
-            fig = go.Figure(data=go.Heatmap(x=p_df1.columns,
-                                            y=p_df1.index,
-                                            z=p_df1.values,
-                                            colorscale='RdBu',
-                                            customdata=custom_data,
-                                            hovertemplate="Quarter : %{y}"+
-                                                "<br>Year : %{x}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(height=150,
-                              width=400,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_map():
+                fig = geo_choropleth_plot_statewise(df, 'state', 'transaction_count', "", selected_state, 'year')
+                initial_year = df[df['year'] == df['year'].max()]
+                initial_year['count_sum_col'] = np.full(len(initial_year), value_formats(initial_year['transaction_count'].sum()))
+                initial_year['amount_sum_col'] = np.full(len(initial_year), value_formats(initial_year['transaction_amount'].sum()))
+                fig.update_traces(customdata = initial_year[['state', 'year', 'quarter', 'count_sum_col', 'amount_sum_col']].values,
+                            hovertemplate="Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+
+                for frame in fig.frames:
+                    frame_df = df[df['year'] == int(frame.name)]
+                    frame_df['count_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_count'].sum()))
+                    frame_df['amount_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_amount'].sum()))
+                    frame.data[0].customdata = frame_df[['state', 'year', 'quarter', 'count_sum', 'amount_sum']].values
+                    frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+                return fig
+
+            st.plotly_chart(cached_figure("transaction.payment_mode.state_map", (selected_state, selected_year, selected_quarter), build_map), use_container_width=True)
+
+            def build_totals():
+                df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
+                df1['count_s'] = value_formats_array(df1['transaction_count'])
+                df1['amount_s'] = value_formats_array(df1['transaction_amount'])
+                return df1
+            df1 = cached_frame("transaction.payment_mode.period_totals", (selected_state, selected_year, selected_quarter), build_totals)
+
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df1, 'quarter', 'year', 'transaction_count', ['transaction_count', 'transaction_amount']),
+                                     'RdBu',
+                                     "Quarter : %{y}"+
+                                         "<br>Year : %{x}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=150,
+                                     width=400,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.period_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
             with st.expander(f"Detailed Info of {selected_state}({selected_quarter}) Transaction Count behaviour"):
                 st.dataframe(df1)
 
         st.markdown(f"<h4 style ='color: skyblue;'>{selected_state} (Overall {selected_quarter}) - Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
         with st.container(border=True):
-            df['count'] = df['transaction_count'].apply(value_formats)
-            df['amount'] = df['transaction_amount'].apply(value_formats)
-            pivot_df = df.pivot_table(index='transaction_type', columns='year', values='transaction_count')
-            c = df.pivot_table(index='transaction_type', columns='year', values='count', aggfunc='first')
-            a = df.pivot_table(index='transaction_type', columns='year', values='amount', aggfunc='first')
-            q = df.pivot_table(index='transaction_type', columns='year', values='quarter', aggfunc='first')
-
-            custom_data = np.dstack((c.values, a.values, q.values))
-            fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                            y=pivot_df.index,
-                                            z=pivot_df.values,
-                                            colorscale='YlOrRd',
-                                            customdata=custom_data,
-                                            hovertemplate="Year : %{x}"+
-                                                "<br>Quarter : %{customdata[2]}" +
-                                                "<br>Type : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>"))
-            fig.update_layout(height=400,
-                              width=400,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df, 'transaction_type', 'year', 'transaction_count', ['transaction_count', 'transaction_amount'], ['quarter']),
+                                     'YlOrRd',
+                                     "Year : %{x}"+
+                                         "<br>Quarter : %{customdata[2]}" +
+                                         "<br>Type : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=400,
+                                     width=400,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.type_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
         with st.expander(f"Detailed Info on {selected_state} Overall {selected_quarter}"):
-            st.dataframe(df)
+            detail_table("transaction.payment_mode.detail", "aggregated_transaction",
+                         {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
     elif selected_state != "All" and selected_quarter == "All" and selected_year == "All":
-        query = f"""SELECT * FROM aggregated_transaction
-                    WHERE state='{selected_state}'"""
-        df = pd.read_sql(query, engine)
-        df['count'] = df['transaction_count'].apply(value_formats)
-        df['amount'] = df['transaction_amount'].apply(value_formats)
-
         st.markdown(f"<h4 style ='color: skyblue;'> {selected_state} (Overall) - Transaction Behaviour</h4>", unsafe_allow_html=True)
 
         year_dict = {}
@@ -1120,77 +2185,65 @@ def payment_mode_analysis():
                         st.markdown(f"<h5 style ='color: Green;'>Transaction Count: {value_formats(df['transaction_count'].sum())}</h5>", unsafe_allow_html=True)
                         st.markdown(f"<h5 style ='color: Green;'>Transaction Amount : ₹ {value_formats(df['transaction_amount'].sum())}</h5>", unsafe_allow_html=True)
         with st.container(border=True):
-            fig = geo_choropleth_plot_statewise(df, 'state', 'transaction_count', "", selected_state, 'year')
-            initial_year = df[df['year'] == df['year'].max()]
-            initial_year['count_sum_col'] = np.full(len(initial_year), value_formats(initial_year['transaction_count'].sum()))
-            initial_year['amount_sum_col'] = np.full(len(initial_year), value_formats(initial_year['transaction_amount'].sum()))
-            fig.update_traces(customdata = initial_year[['state', 'year', 'count_sum_col', 'amount_sum_col']].values,
-                        hovertemplate="Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
-        
-            for frame in fig.frames:
-                frame_df = df[df['year'] == int(frame.name)]
-                frame_df['count_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_count'].sum()))
-                frame_df['amount_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_amount'].sum()))
-                frame.data[0].customdata = frame_df[['state', 'year', 'count_sum', 'amount_sum']].values
-                frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
-                
-            st.plotly_chart(fig, use_container_width=True)
-
-            df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
-            df1['count_s'] = df1['transaction_count'].apply(value_formats)
-            df1['amount_s'] = df1['transaction_amount'].apply(value_formats)
-
-            p_df1 = df1.pivot_table(index='quarter', columns='year', values='transaction_count')
-            c = df1.pivot_table(index='quarter', columns='year', values='count_s', aggfunc='first')
-            a = df1.pivot_table(index='quarter', columns='year', values='amount_s', aggfunc='first')
-            zmin = p_df1.values.min()
-            zmax = p_df1.values.max()
-            custom_data = np.dstack((c.values, a.values))
-            fig = go.Figure(data=go.Heatmap(x=p_df1.columns,
-                                            y=p_df1.index,
-                                            z=p_df1.values,
-                                            colorscale='RdBu',
-                                            customdata=custom_data,
-                                            hovertemplate="Quarter : %{y}"+
-                                                "<br>Year : %{x}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(height=300,
-                              width=400,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_map():
+                fig = geo_choropleth_plot_statewise(df, 'state', 'transaction_count', "", selected_state, 'year')
+                initial_year = df[df['year'] == df['year'].max()]
+                initial_year['count_sum_col'] = np.full(len(initial_year), value_formats(initial_year['transaction_count'].sum()))
+                initial_year['amount_sum_col'] = np.full(len(initial_year), value_formats(initial_year['transaction_amount'].sum()))
+                fig.update_traces(customdata = initial_year[['state', 'year', 'count_sum_col', 'amount_sum_col']].values,
+                            hovertemplate="Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
+
+                for frame in fig.frames:
+                    frame_df = df[df['year'] == int(frame.name)]
+                    frame_df['count_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_count'].sum()))
+                    frame_df['amount_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_amount'].sum()))
+                    frame.data[0].customdata = frame_df[['state', 'year', 'count_sum', 'amount_sum']].values
+                    frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[2]}<br>Transaction Amount : ₹ %{customdata[3]}<extra></extra>")
+                return fig
+
+            st.plotly_chart(cached_figure("transaction.payment_mode.state_map", (selected_state, selected_year, selected_quarter), build_map), use_container_width=True)
+
+            def build_totals():
+                df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
+                df1['count_s'] = value_formats_array(df1['transaction_count'])
+                df1['amount_s'] = value_formats_array(df1['transaction_amount'])
+                return df1
+            df1 = cached_frame("transaction.payment_mode.period_totals", (selected_state, selected_year, selected_quarter), build_totals)
+
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df1, 'quarter', 'year', 'transaction_count', ['transaction_count', 'transaction_amount']),
+                                     'RdBu',
+                                     "Quarter : %{y}"+
+                                         "<br>Year : %{x}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=300,
+                                     width=400,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.period_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
             with st.expander(f"Detailed Info of {selected_state}(Overall) Transaction Count behaviour"):
                 st.dataframe(df1)
 
         st.markdown(f"<h4 style ='color: skyblue;'> {selected_state} (Overall) - Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
         with st.container(border=True):
-            pivot_df = df.pivot_table(index='transaction_type', columns='year', values='transaction_count')
-            c = df.pivot_table(index='transaction_type', columns='year', values='count', aggfunc='first')
-            a = df.pivot_table(index='transaction_type', columns='year', values='amount', aggfunc='first')
-            q = df.pivot_table(index='transaction_type', columns='year', values='quarter', aggfunc='first')
-
-            custom_data = np.dstack((c.values, a.values, q.values))
-            fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                            y=pivot_df.index,
-                                            z=pivot_df.values,
-                                            colorscale='YlOrRd',
-                                            customdata=custom_data,
-                                            hovertemplate="Year : %{x}"+
-                                                "<br>Quarter : %{customdata[2]}" +
-                                                "<br>Type : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>"))
-            fig.update_layout(height=400,
-                              width=400,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df, 'transaction_type', 'year', 'transaction_count', ['transaction_count', 'transaction_amount'], ['quarter']),
+                                     'YlOrRd',
+                                     "Year : %{x}"+
+                                         "<br>Quarter : %{customdata[2]}" +
+                                         "<br>Type : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=400,
+                                     width=400,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.type_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
         with st.expander(f"Detailed Info on {selected_state} - All years"):
-            st.dataframe(df)
+            detail_table("transaction.payment_mode.detail", "aggregated_transaction",
+                         {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
     elif selected_quarter == "All" and selected_year != "All":
-        query = f"""SELECT * FROM aggregated_transaction
-                    WHERE state='{selected_state}' AND year={selected_year};"""
-        df = pd.read_sql(query, engine)
         st.markdown(f"<h4 style ='color: skyblue;'> {selected_state} ({selected_year}) - Transaction Behaviour</h4>", unsafe_allow_html=True)
 
         with st.popover(f"Gross {selected_year}"):
@@ -1198,81 +2251,65 @@ def payment_mode_analysis():
             st.markdown(f"<h5 style ='color: Green;'>Transaction Amount : ₹ {value_formats(df['transaction_amount'].sum())}</h5>", unsafe_allow_html=True)
 
         with st.container(border=True):
-            fig = geo_choropleth_plot_statewise(df, 'state', 'transaction_count', "", selected_state, 'quarter')
-            initial = df[df['quarter'] == "Q1"]
-            initial['count_sum_col'] = np.full(len(initial), value_formats(initial['transaction_count'].sum()))
-            initial['amount_sum_col'] = np.full(len(initial), value_formats(initial['transaction_amount'].sum()))
-            fig.update_traces(customdata = initial[['state', 'year', 'quarter', 'count_sum_col', 'amount_sum_col']].values,
-                        hovertemplate="Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-        
-            for frame in fig.frames:
-                frame_df = df[df['quarter'] == frame.name]
-                frame_df['count_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_count'].sum()))
-                frame_df['amount_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_amount'].sum()))
-                frame.data[0].customdata = frame_df[['state', 'year', 'quarter', 'count_sum', 'amount_sum']].values
-                frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-                
-            st.plotly_chart(fig, use_container_width=True)
-
-            df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
-            df1['count_s'] = df1['transaction_count'].apply(value_formats)
-            df1['amount_s'] = df1['transaction_amount'].apply(value_formats)
-
-            p_df1 = df1.pivot_table(index='year', columns='quarter', values='transaction_count')
-            c = df1.pivot_table(index='year', columns='quarter', values='count_s', aggfunc='first')
-            a = df1.pivot_table(index='year', columns='quarter', values='amount_s', aggfunc='first')
-            zmin = p_df1.values.min()
-            zmax = p_df1.values.max()
-            custom_data = np.dstack((c.values, a.values))
-            fig = go.Figure(data=go.Heatmap(x=p_df1.columns,
-                                            y=p_df1.index,
-                                            z=p_df1.values,
-                                            colorscale='RdBu',
-                                            customdata=custom_data,
-                                            hovertemplate="Quarter : %{x}"+
-                                                "<br>Year : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
-                                            zmin=zmin, zmax=zmax))
-            fig.update_layout(height=150,
-                              width=400,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_map():
+                fig = geo_choropleth_plot_statewise(df, 'state', 'transaction_count', "", selected_state, 'quarter')
+                initial = df[df['quarter'] == "Q1"]
+                initial['count_sum_col'] = np.full(len(initial), value_formats(initial['transaction_count'].sum()))
+                initial['amount_sum_col'] = np.full(len(initial), value_formats(initial['transaction_amount'].sum()))
+                fig.update_traces(customdata = initial[['state', 'year', 'quarter', 'count_sum_col', 'amount_sum_col']].values,
+                            hovertemplate="Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+
+                for frame in fig.frames:
+                    frame_df = df[df['quarter'] == frame.name]
+                    frame_df['count_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_count'].sum()))
+                    frame_df['amount_sum'] = np.full(len(frame_df), value_formats(frame_df['transaction_amount'].sum()))
+                    frame.data[0].customdata = frame_df[['state', 'year', 'quarter', 'count_sum', 'amount_sum']].values
+                    frame.data[0].hovertemplate = ("Year : %{customdata[1]}<br>Quarter :%{customdata[2]}<br>State : %{customdata[0]}<br>Transaction Count : %{customdata[3]}<br>Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+                return fig
+
+            st.plotly_chart(cached_figure("transaction.payment_mode.state_map", (selected_state, selected_year, selected_quarter), build_map), use_container_width=True)
+
+            def build_totals():
+                df1 = df.groupby(['state', 'year', 'quarter'])[['transaction_count', 'transaction_amount']].sum().reset_index()
+                df1['count_s'] = value_formats_array(df1['transaction_count'])
+                df1['amount_s'] = value_formats_array(df1['transaction_amount'])
+                return df1
+            df1 = cached_frame("transaction.payment_mode.period_totals", (selected_state, selected_year, selected_quarter), build_totals)
+
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df1, 'year', 'quarter', 'transaction_count', ['transaction_count', 'transaction_amount']),
+                                     'RdBu',
+                                     "Quarter : %{x}"+
+                                         "<br>Year : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=150,
+                                     width=400,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.period_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
             with st.expander(f"Detailed Info of {selected_state}({selected_year}) Transaction Count behaviour"):
                 st.dataframe(df1)
 
         st.markdown(f"<h4 style ='color: skyblue;'>{selected_state} ({selected_year}) - Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
         with st.container(border=True):
-            df['count'] = df['transaction_count'].apply(value_formats)
-            df['amount'] = df['transaction_amount'].apply(value_formats)
-            pivot_df = df.pivot_table(index='transaction_type', columns='quarter', values='transaction_count')
-            c = df.pivot_table(index='transaction_type', columns='quarter', values='count', aggfunc='first')
-            a = df.pivot_table(index='transaction_type', columns='quarter', values='amount', aggfunc='first')
-            q = df.pivot_table(index='transaction_type', columns='quarter', values='year', aggfunc='first')
-
-            custom_data = np.dstack((c.values, a.values, q.values))
-            fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                            y=pivot_df.index,
-                                            z=pivot_df.values,
-                                            colorscale='YlOrRd',
-                                            customdata=custom_data,
-                                            hovertemplate="Year : %{customdata[2]}"+
-                                                "<br>Quarter : %{x}" +
-                                                "<br>Type : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>"))
-            fig.update_layout(height=400,
-                              width=400,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df, 'transaction_type', 'quarter', 'transaction_count', ['transaction_count', 'transaction_amount'], ['year']),
+                                     'YlOrRd',
+                                     "Year : %{customdata[2]}"+
+                                         "<br>Quarter : %{x}" +
+                                         "<br>Type : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=400,
+                                     width=400,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.type_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap), use_container_width=True)
         with st.expander(f"Detailed Info on {selected_state} in {selected_year} (for all quarters)"):
-            st.dataframe(df)
+            detail_table("transaction.payment_mode.detail", "aggregated_transaction",
+                         {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
     else:
-        query = f"""SELECT * FROM aggregated_transaction
-                    WHERE state='{selected_state}' AND year={selected_year} AND quarter='{selected_quarter}';"""
-        df = pd.read_sql(query, engine)
-        df['count'] = df['transaction_count'].apply(value_formats)
-        df['amount'] = df['transaction_amount'].apply(value_formats)
         count_sum = value_formats(df['transaction_count'].sum())
         amount_sum = value_formats(df['transaction_amount'].sum())
 
@@ -1282,55 +2319,45 @@ def payment_mode_analysis():
             st.markdown(f"<h5 style = 'color: green;'> Transaction Amount : ₹ {amount_sum}</h5>", unsafe_allow_html=True)
             st.markdown(f"<h5 style = 'color: green;'> Transaction Count : {count_sum}</h5>", unsafe_allow_html=True)
         with st.container(border=True):
-            count_sum_col = np.full(len(df), count_sum)
-            amount_sum_col = np.full(len(df), amount_sum)
-            fig = geo_choropleth_plot_statewise(df, 'state', 'transaction_count', "", selected_state, None)
-            fig.update_traces(customdata = np.stack((df['state'], df['year'], df['quarter'], count_sum_col, amount_sum_col), axis=1),
-                            hovertemplate="State : %{customdata[0]}<br>"\
-                                        "Year : %{customdata[1]}<br>" \
-                                        "Quarter : %{customdata[2]}<br>"\
-                                        "Transaction Count : %{customdata[3]}<br>"\
-                                        "Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
-            st.plotly_chart(fig)
+            def build_map():
+                count_sum_col = np.full(len(df), count_sum)
+                amount_sum_col = np.full(len(df), amount_sum)
+                fig = geo_choropleth_plot_statewise(df, 'state', 'transaction_count', "", selected_state, None)
+                fig.update_traces(customdata = np.stack((df['state'], df['year'], df['quarter'], count_sum_col, amount_sum_col), axis=1),
+                                hovertemplate="State : %{customdata[0]}<br>"\
+                                            "Year : %{customdata[1]}<br>" \
+                                            "Quarter : %{customdata[2]}<br>"\
+                                            "Transaction Count : %{customdata[3]}<br>"\
+                                            "Transaction Amount : ₹ %{customdata[4]}<extra></extra>")
+                return fig
+
+            st.plotly_chart(cached_figure("transaction.payment_mode.state_map", (selected_state, selected_year, selected_quarter), build_map))
         st.markdown(f"<h4 style ='color: skyblue;'>{selected_state} ({selected_year}-{selected_quarter}) - Transaction Payment Type Distribution</h4>", unsafe_allow_html=True)
         with st.container(border=True):
-            pivot_df = df.pivot_table(index='transaction_type', columns='year', values='transaction_count')
-            c = df.pivot_table(index='transaction_type', columns='year', values='count', aggfunc='first')
-            a = df.pivot_table(index='transaction_type', columns='year', values='amount', aggfunc='first')
-            q = df.pivot_table(index='transaction_type', columns='year', values='quarter', aggfunc='first')
-
-            custom_data = np.dstack((c.values, a.values, q.values))
-            fig = go.Figure(data=go.Heatmap(x=pivot_df.columns,
-                                            y=pivot_df.index,
-                                            z=pivot_df.values,
-                                            colorscale='YlOrRd',
-                                            customdata=custom_data,
-                                            hovertemplate="Year : %{x}"+
-                                                "<br>Quarter : %{customdata[2]}" +
-                                                "<br>Type : %{y}"+
-                                                "<br>Transaction Count: %{customdata[0]}"+
-                                                "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>"))
-            fig.update_layout(height=400,
-                              margin=dict(t=0,b=0))
-            st.plotly_chart(fig)
+            def build_heatmap():
+                fig = heatmap_figure(heatmap_data(df, 'transaction_type', 'year', 'transaction_count', ['transaction_count', 'transaction_amount'], ['quarter']),
+                                     'YlOrRd',
+                                     "Year : %{x}"+
+                                         "<br>Quarter : %{customdata[2]}" +
+                                         "<br>Type : %{y}"+
+                                         "<br>Transaction Count: %{customdata[0]}"+
+                                         "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>",
+                                     height=400,
+                                     margin=dict(t=0,b=0))
+                return fig
+            st.plotly_chart(cached_figure("transaction.payment_mode.type_heatmap", (selected_state, selected_year, selected_quarter), build_heatmap))
         with st.expander(f"Detailed Info on {selected_state} in {selected_year} - {selected_quarter}"):
-            st.dataframe(df)
+            detail_table("transaction.payment_mode.detail", "aggregated_transaction",
+                         {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
+
+    export_links("transaction.payment_mode", {"state": selected_state, "year": selected_year, "quarter": selected_quarter})
 
 def yearwise_analysis():    
     selected_year = st.sidebar.selectbox("Choose Year: ", ["All"]+year_list(), key="year_selectbox")
     st.markdown(f"<h4 style ='color: skyblue;'>Year({selected_year}) Statewise - High and Low Volumed Transaction</h4>", unsafe_allow_html=True)
-    if selected_year != "All":
-        query = f"""SELECT state, year, SUM(transaction_count) as count, SUM(transaction_amount) as amount
-                    FROM aggregated_transaction WHERE year={selected_year} GROUP BY state ORDER BY count DESC;"""
-    else:
-        query = f"""SELECT state, SUM(transaction_count) as count, SUM(transaction_amount) as amount
-                    FROM aggregated_transaction GROUP BY state ORDER BY count DESC;"""
-        
-    with engine.connect() as conn:
-        conn.execute(text("SET SESSION sql_mode = (SELECT REPLACE(@@sql_mode, 'ONLY_FULL_GROUP_BY', ''))"))
-        df = pd.read_sql(query, conn)
-    df['count_f'] = df['count'].apply(value_formats)
-    df['amount_f'] = df['amount'].apply(value_formats)
+    top_df = leaderboard('transaction_count', 'state', selected_year, "All", 'top', 10, 'count')[::-1]
+    mid_df = leaderboard('transaction_count', 'state', selected_year, "All", 'moderate', 10, 'count')[::-1]
+    bottom_df = leaderboard('transaction_count', 'state', selected_year, "All", 'bottom', 10, 'count')
 
     with st.container(border=True):
         if selected_year != "All":
@@ -1338,10 +2365,6 @@ def yearwise_analysis():
         else:
             tab1, tab2, tab3 = st.tabs(["TOP 10 States(All years)","MODERATE States(All Years)","BOTTOM 10 States(All years)"])
         with tab1:
-            if selected_year != "All":
-                top_df = df.head(10)[::-1]
-            else:
-                top_df = df.head(10)[::-1]
             fig = px.bar(top_df, x="count", y="state", color="count", color_continuous_scale="sunsetdark", text_auto=True)
             fig.update_traces(customdata=top_df[["count_f", "amount_f"]].values,
                               hovertemplate="State: %{y}" \
@@ -1356,10 +2379,6 @@ def yearwise_analysis():
                 with st.expander("Detailed Info on TOP 10 States(All years)"):
                     st.dataframe(top_df)
         with tab2:
-            if selected_year != "All":
-                mid_df = df.iloc[10:-10][::-1]
-            else:
-                mid_df = df.iloc[10:-10][::-1]
             fig = px.bar(mid_df, x="count", y="state", color="count", color_continuous_scale="sunsetdark", text_auto=True)
             fig.update_traces(customdata=mid_df[["count_f", "amount_f"]].values,
                               hovertemplate="State: %{y}" \
@@ -1374,12 +2393,8 @@ def yearwise_analysis():
                 with st.expander("Detailed Info on Moderate States(All years)"):
                     st.dataframe(mid_df)
         with tab3:
-            if selected_year != "All":
-                bottom_df = df.tail(10)
-            else:
-                bottom_df = df.tail(10)
             fig = px.bar(bottom_df, x="count", y="state", color="count", color_continuous_scale="sunsetdark", text_auto=True)
-            fig.update_traces(customdata=top_df[["count_f", "amount_f"]].values,
+            fig.update_traces(customdata=bottom_df[["count_f", "amount_f"]].values,
                               hovertemplate="State: %{y}" \
                                             "<br>Transaction Volume: %{customdata[0]}" \
                                             "<br>Transaction Amount: ₹ %{customdata[1]}<extra></extra>")
@@ -1395,20 +2410,8 @@ def yearwise_analysis():
     #selected_year = st.selectbox("Choose Year: ", ["All"]+year_list(), key="year_selectbox1")
     st.markdown(f"<h4 style ='color: skyblue;'>Year({selected_year}) Districtwise - High and Low Volumed Transaction</h4>", unsafe_allow_html=True)
 
-    if selected_year != "All":
-        query = f"""SELECT state, district, year, SUM(transaction_count) as count, SUM(transaction_amount) as amount
-                    FROM top_transaction_districtwise WHERE year={selected_year}
-                    GROUP BY state, district ORDER BY count DESC;"""
-    else:
-        query = """SELECT state, district, SUM(transaction_count) as count, SUM(transaction_amount) as amount
-                    FROM top_transaction_districtwise
-                    GROUP BY state, district ORDER BY count DESC;"""
-
-    with engine.connect() as conn:
-        conn.execute(text("SET SESSION sql_mode = (SELECT REPLACE(@@sql_mode, 'ONLY_FULL_GROUP_BY', ''))"))
-        df = pd.read_sql(query, conn)
-    df['count_f'] = df['count'].apply(value_formats)
-    df['amount_f'] = df['amount'].apply(value_formats)
+    top_df = leaderboard('transaction_count', 'district', selected_year, "All", 'top', 10, 'count')[::-1]
+    bottom_df = leaderboard('transaction_count', 'district', selected_year, "All", 'bottom', 10, 'count')
 
     with st.container(border=True):
         if selected_year != "All":
@@ -1416,10 +2419,6 @@ def yearwise_analysis():
         else:
             tab1, tab2 = st.tabs(["TOP 10 Districts(All years)","BOTTOM 10 Districts(All years)"])
         with tab1:
-            if selected_year != "All":
-                top_df = df.head(10)[::-1]
-            else:
-                top_df = df.head(10)[::-1]
             fig = px.bar(top_df, x="count", y="district", color="count", color_continuous_scale="oranges", text_auto=True)
             fig.update_traces(customdata=top_df[["count_f", "amount_f","state"]].values,
                               hovertemplate="State: %{customdata[2]}"
@@ -1435,10 +2434,6 @@ def yearwise_analysis():
                 with st.expander("Detailed Info on TOP 10 Districts(All years)"):
                     st.dataframe(top_df)
         with tab2:
-            if selected_year != "All":
-                bottom_df = df.tail(10)
-            else:
-                bottom_df = df.tail(10)
             fig = px.bar(bottom_df, x="count", y="district", color="count", color_continuous_scale="oranges", text_auto=True)
             fig.update_traces(customdata=bottom_df[["count_f", "amount_f", "state"]].values,
                               hovertemplate="State: %{customdata[2]}"
@@ -1458,21 +2453,8 @@ def yearwise_analysis():
     #selected_year = st.selectbox("Choose Year: ", ["All"]+year_list(), key="year_selectbox2")
     st.markdown(f"<h4 style ='color: skyblue;'>Year({selected_year}) Pincodewise - High and Low Volumed Transaction</h4>", unsafe_allow_html=True)
 
-    if selected_year != "All":
-        query = f"""SELECT state, pincode, year, SUM(transaction_count) as count, SUM(transaction_amount) as amount
-                    FROM top_transaction_pincodewise WHERE year={selected_year}
-                    GROUP BY state, pincode ORDER BY count DESC;"""
-    else:
-        query = """SELECT state, pincode, SUM(transaction_count) as count, SUM(transaction_amount) as amount
-                    FROM top_transaction_pincodewise
-                    GROUP BY state, pincode ORDER BY count DESC;"""
-
-    with engine.connect() as conn:
-        conn.execute(text("SET SESSION sql_mode = (SELECT REPLACE(@@sql_mode, 'ONLY_FULL_GROUP_BY', ''))"))
-        df = pd.read_sql(query, conn)
-    df['pincode'] = df['pincode'].astype(str)
-    df['count_f'] = df['count'].apply(value_formats)
-    df['amount_f'] = df['amount'].apply(value_formats)
+    top_df = leaderboard('transaction_count', 'pincode', selected_year, "All", 'top', 10, 'count')[::-1]
+    bottom_df = leaderboard('transaction_count', 'pincode', selected_year, "All", 'bottom', 10, 'count')
 
     with st.container(border=True):
         if selected_year != "All":
@@ -1480,10 +2462,6 @@ def yearwise_analysis():
         else:
             tab1, tab2 = st.tabs(["TOP 10 Pincodes(All years)","BOTTOM 10 Pincodes(All years)"])
         with tab1:
-            if selected_year != "All":
-                top_df = df.head(10)[::-1]
-            else:
-                top_df = df.head(10)[::-1]
             fig = px.bar(top_df, x="count", y="pincode", color="count", color_continuous_scale="tropic", text_auto=True)
             fig.update_traces(customdata=top_df[["count_f", "amount_f","state"]].values,
                               hovertemplate="State: %{customdata[2]}"
@@ -1499,12 +2477,8 @@ def yearwise_analysis():
                 with st.expander("Detailed Info on TOP 10 Pincodes(All years)"):
                     st.dataframe(top_df)
         with tab2:
-            if selected_year != "All":
-                bottom_df = df.tail(10)
-            else:
-                bottom_df = df.tail(10)
             fig = px.bar(bottom_df, x="count", y="pincode", color="count", color_continuous_scale="tropic", text_auto=True)
-            fig.update_traces(customdata=top_df[["count_f", "amount_f", "state"]].values,
+            fig.update_traces(customdata=bottom_df[["count_f", "amount_f", "state"]].values,
                               hovertemplate="State: %{customdata[2]}"
                                             "<br>Pincode: %{y}" \
                                             "<br>Transaction Volume: %{customdata[0]}" \
@@ -1519,14 +2493,8 @@ def yearwise_analysis():
                     st.dataframe(bottom_df) 
     st.markdown("<h4 style ='color: skyblue;'>Year Over Year Rising Transaction Volume</h4>", unsafe_allow_html=True)
 
-    query = """SELECT state, year, district, SUM(transaction_count) as count 
-                FROM map_transaction GROUP BY state, year, district;"""
-    df_yearly = pd.read_sql(query, engine)
-
-    df_yearly.sort_values(by=['state', 'district', 'year'], inplace=True)
-    df_yearly['prev_year_count'] = df_yearly.groupby(['state', 'district'])['count'].shift(1)
-    df_yearly['growth_percentage'] = ((df_yearly['count'] - df_yearly['prev_year_count']) / df_yearly['prev_year_count']) * 100
-    rising = df_yearly[(df_yearly['prev_year_count'] < 10000) & (df_yearly['growth_percentage'] > 100)].reset_index()
+    rising = rising_districts('transaction_count', 10000, 100).rename(columns={'base_value': 'prev_year_count', 'value': 'count',
+                                                                              'growth_percent': 'growth_percentage'})
     with st.container(border=True):
         rising_sorted = rising.sort_values(by='growth_percentage', ascending=False)
         rising_sorted['state_year'] = rising_sorted['state'] + ' - ' + rising_sorted['year'].astype(str)
@@ -1538,62 +2506,120 @@ def yearwise_analysis():
         st.plotly_chart(fig, use_container_width=True)
         with st.expander("Year Over year Rising Growth"):
             st.dataframe(rising)
+    export_links("transaction.districts", {"year": selected_year})
+
+# Sunburst drill-down: nodes for every level are aggregated once per data version,
+# the browser only receives the selected node with two rings below it
+SUNBURST_LEVELS = ['state', 'district', 'year', 'quarter']
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
+def transaction_volume_nodes(version):
+    query = """SELECT state, district, year, quarter, SUM(transaction_count) AS transaction_count
+                FROM top_transaction_districtwise GROUP BY state, district, year, quarter;"""
+    df = read_sql(query, read_engine())
+
+    nodes = [pd.DataFrame([{'id': 'India', 'parent': '', 'label': 'India', 'depth': 0,
+                            'transaction_count': df['transaction_count'].sum()}])]
+    ids = pd.Series('India', index=df.index)
+    for depth, column in enumerate(SUNBURST_LEVELS, start=1):
+        parent_ids = ids
+        ids = parent_ids + '/' + df[column].astype(str)
+        level = (df.assign(id=ids, parent=parent_ids, label=df[column].astype(str))
+                   .groupby(['id', 'parent', 'label'], as_index=False)['transaction_count'].sum())
+        level['depth'] = depth
+        nodes.append(level)
+    return pd.concat(nodes, ignore_index=True)
+
+def sunburst_level_nodes(nodes, node_id):
+    children = nodes[nodes['parent'] == node_id]
+    grandchildren = nodes[nodes['parent'].isin(children['id'])]
+    return pd.concat([nodes[nodes['id'] == node_id], children, grandchildren], ignore_index=True)
+
+def sunburst_drilldown(section, root_id):
+    nodes = transaction_volume_nodes(data_version())
+    node_key = f"{section}.node"
+    child_key = f"{section}.child"
+    node = str(st.session_state.get(node_key, ''))
+    if node != root_id and not node.startswith(root_id + '/'):
+        st.session_state[node_key] = root_id
+    current = st.session_state[node_key]
+
+    def drill_in():
+        if st.session_state[child_key] is not None:
+            st.session_state[node_key] = st.session_state[child_key]
+            st.session_state[child_key] = None
+
+    def drill_up():
+        st.session_state[node_key] = current.rsplit('/', 1)[0]
+
+    visible = sunburst_level_nodes(nodes, current)
+    children = visible[visible['parent'] == current]
+    col1, col2 = st.columns([0.8, 0.2])
+    with col1:
+        st.selectbox("Drill into:", [None] + children['id'].tolist(), key=child_key, on_change=drill_in,
+                     format_func=lambda node: "Select..." if node is None else node.rsplit('/', 1)[-1],
+                     disabled=children.empty)
+    with col2:
+        st.button("Up one level", key=f"{section}.up", on_click=drill_up, disabled=current == root_id)
+    st.caption(" > ".join(current.split('/')))
+
+    def build_sunburst():
+        fig = go.Figure(go.Sunburst(ids=visible['id'],
+                                    labels=visible['label'],
+                                    parents=visible['parent'].where(visible['id'] != current, ''),
+                                    values=visible['transaction_count'],
+                                    branchvalues='total',
+                                    marker=dict(colors=visible['transaction_count'], colorscale='Plasma', showscale=True),
+                                    insidetextorientation='radial',
+                                    hovertemplate="Label= %{label}" \
+                                                "<br>Id= %{id}" \
+                                                "<br>Parent= %{percentParent:.2%}<br>"\
+                                                "Root= %{percentRoot:.2%}<extra></extra>"))
+        fig.update_layout(height=600, margin=dict(t=0,b=0,l=0,r=0), uniformtext=dict(minsize=10, mode='hide'))
+        return fig
+
+    st.plotly_chart(cached_figure(section, (current,), build_sunburst), use_container_width=True)
 
 def overall_analysis():
     selected_state = st.sidebar.selectbox("Choose State: ", ['All'] + state_list(), key="state_selectbox")
+    selected_district = 'All'
 
     if selected_state == 'All':
         st.markdown("<h4 style ='color: skyblue;'>India Overall - Transaction Volume</h4>", unsafe_allow_html=True)
         with st.container(border=True):
-            query = "SELECT * FROM top_transaction_districtwise;"
-            df = pd.read_sql(query, engine)
-            df['count'] = df['transaction_count'].apply(value_formats)
-
-            fig = px.sunburst(df, path=['state', 'district', 'year', 'quarter'], values='transaction_count', color='transaction_count', color_continuous_scale='Plasma')        
-            fig.update_traces(insidetextorientation='radial',
-                              hovertemplate="Label= %{label}" \
-                                            "<br>Id= %{id}" \
-                                            "<br>Parent= %{percentParent:.2%}<br>"\
-                                            "Root= %{percentRoot:.2%}<extra></extra>")
-            fig.update_layout(height=600, margin=dict(t=0,b=0,l=0,r=0), uniformtext=dict(minsize=10, mode='hide'))
-            st.plotly_chart(fig, use_container_width=True)
+            sunburst_drilldown("transaction.overall.sunburst", "India")
             with st.expander("Detailed info overall"):
-                st.dataframe(df)
+                detail_table("transaction.overall.detail", "top_transaction_districtwise", {})
     else:
         dis_dict = district_list()
         selected_district = st.sidebar.selectbox("Choose District:", ['All'] + dis_dict[selected_state])
         if selected_district == 'All':
             st.markdown(f"<h4 style ='color: skyblue;'>{selected_state} - Overall Transaction Volume</h4>", unsafe_allow_html=True)
             with st.container(border=True):
-                query = f"SELECT * FROM top_transaction_districtwise WHERE state='{selected_state}';"
-                df = pd.read_sql(query, engine)
-
-                fig = px.sunburst(df, path=['state', 'district', 'year', 'quarter'], values='transaction_count', color='transaction_count', color_continuous_scale='Plasma')        
-                fig.update_traces(insidetextorientation='radial',
-                                hovertemplate="Label= %{label}" \
-                                                "<br>Id= %{id}" \
-                                                "<br>Parent= %{percentParent:.2%}<br>"\
-                                                "Root= %{percentRoot:.2%}<extra></extra>")
-                fig.update_layout(height=600, margin=dict(t=0,b=0,l=0,r=0), uniformtext=dict(minsize=10, mode='hide'))
-                st.plotly_chart(fig, use_container_width=True)
+                sunburst_drilldown("transaction.overall.sunburst", f"India/{selected_state}")
                 with st.expander(f"Detailed info on {selected_state} Overall"):
-                    st.dataframe(df)
+                    detail_table("transaction.overall.detail", "top_transaction_districtwise", {"state": selected_state})
         else:
             st.markdown(f"<h4 style ='color: skyblue;'>{selected_state} - {selected_district} Transaction Volume</h4>", unsafe_allow_html=True)
             with st.container(border=True):
                 query = f"SELECT * FROM top_transaction_districtwise WHERE state='{selected_state}' and district='{selected_district}';"
-                df = pd.read_sql(query, engine)
-
-                fig = px.sunburst(df, path=['district', 'year', 'quarter'], values='transaction_count', color='transaction_count', color_continuous_scale='Plasma')        
-                fig.update_traces(insidetextorientation='radial',
-                                hovertemplate="Label= %{label}" \
-                                                "<br>Id= %{id}" \
-                                                "<br>Parent= %{percentParent:.2%}<br>"\
-                                                "Root= %{percentRoot:.2%}<extra></extra>")
-                fig.update_layout(height=600, margin=dict(t=0,b=0,l=0,r=0), uniformtext=dict(minsize=10, mode='hide'))
-                st.plotly_chart(fig, use_container_width=True)
+                df = read_sql(query, read_engine())
+
+                def build_sunburst():
+                    fig = px.sunburst(df, path=['district', 'year', 'quarter'], values='transaction_count', color='transaction_count', color_continuous_scale='Plasma')        
+                    fig.update_traces(insidetextorientation='radial',
+                                    hovertemplate="Label= %{label}" \
+                                                    "<br>Id= %{id}" \
+                                                    "<br>Parent= %{percentParent:.2%}<br>"\
+                                                    "Root= %{percentRoot:.2%}<extra></extra>")
+                    fig.update_layout(height=600, margin=dict(t=0,b=0,l=0,r=0), uniformtext=dict(minsize=10, mode='hide'))
+                    return fig
+
+                st.plotly_chart(cached_figure("transaction.overall.sunburst", (selected_state, selected_district), build_sunburst), use_container_width=True)
                 with st.expander(f"Detailed info on {selected_state} - {selected_district}"):
-                    st.dataframe(df)
+                    detail_table("transaction.overall.detail", "top_transaction_districtwise",
+                                 {"state": selected_state, "district": selected_district})
+    export_links("transaction.top_districts", {"state": selected_state, "district": selected_district})
 def location_mode_analysis():
     st.markdown("<h3 style ='color: blue;'>Transaction Volume Analysis across States and Districts</h3>", unsafe_allow_html=True)
     st.markdown("\n")
@@ -1615,27 +2641,97 @@ def third_page():
 # ------------------------------------------ INSURANCE PAGE -------------------------------------------------- #
 
 
+# Growth
+
+def growth_between(metric, geo_level, base, target):
+    # base and target are (year, quarter) pairs, quarter "All" for whole years; both sides are
+    # rows of the Growth table written by the ETL, so any pair is two indexed lookups
+    query = """SELECT t.state, t.district, b.value AS base_value, t.value AS value,
+                       ROUND((t.value - b.value) * 100 / NULLIF(b.value, 0), 2) AS growth_percent
+                FROM growth AS t LEFT JOIN growth AS b
+                ON b.metric = t.metric AND b.geo_level = t.geo_level AND b.state = t.state AND b.district = t.district
+                AND b.year = :base_year AND b.quarter = :base_quarter
+                WHERE t.metric = :metric AND t.geo_level = :geo_level AND t.year = :year AND t.quarter = :quarter;"""
+    df = read_sql(query, read_engine(), params={"metric": metric, "geo_level": geo_level,
+                                                "base_year": int(base[0]), "base_quarter": base[1],
+                                                "year": int(target[0]), "quarter": target[1]})
+    if geo_level == 'state':
+        df = df.drop(columns='district')
+    return df
+
+def rising_districts(metric, max_base, min_growth):
+    # Districts whose yearly value grew by more than min_growth percent from a base under max_base,
+    # read from the ETL's yearly Growth rows and their stored YoY
+    query = """SELECT t.state, t.year, t.district, b.value AS base_value, t.value AS value, t.yoy_percent AS growth_percent
+               FROM growth AS t INNER JOIN growth AS b
+               ON b.metric = t.metric AND b.geo_level = t.geo_level AND b.state = t.state AND b.district = t.district
+               AND b.quarter = t.quarter AND b.year = t.year - 1
+               WHERE t.metric = :metric AND t.geo_level = 'district' AND t.quarter = 'All'
+               AND b.value < :max_base AND t.yoy_percent > :min_growth;"""
+    return read_sql(query, read_engine(), params={"metric": metric, "max_base": max_base, "min_growth": min_growth})
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
+def state_priority(version):
+    # Latest complete year against the one before it, categorised once per data version. A year still
+    # being loaded would read as a fall everywhere, so only years with every quarter loaded count
+    query = """SELECT year FROM growth
+               WHERE metric = 'insurance_count' AND geo_level = 'state' AND quarter <> 'All'
+               GROUP BY year HAVING COUNT(DISTINCT quarter) = :quarters ORDER BY year DESC LIMIT 2;"""
+    years = read_sql(query, read_engine(), params={"quarters": len(quarter_list())})['year'].tolist()
+    if len(years) < 2:
+        return pd.DataFrame(columns=['state', 'growth_percent', 'total_volume', 'state_category', 'volume_f'])
+    latest, previous = years
+    growth = growth_between('insurance_count', 'state', (previous, "All"), (latest, "All"))
+
+    query = """SELECT state, SUM(insurance_count) as total_volume FROM map_insurance GROUP BY state;"""
+    volume = read_sql(query, read_engine())
+    df = growth[['state', 'growth_percent']].merge(volume, on='state')
+
+    high_volume = df['total_volume'] > 100000
+    low_volume = df['total_volume'] < 100000
+    df['state_category'] = np.select([(df['growth_percent'] <= 20) & high_volume,
+                                      (df['growth_percent'] > 20) & high_volume,
+                                      (df['growth_percent'] > 20) & low_volume],
+                                     ["Saturated", "Best", "Rising"], default="Idle")
+    df['state_category'] = pd.Categorical(df['state_category'], categories=['Best', 'Saturated', 'Rising', 'Idle'], ordered=True)
+    df['volume_f'] = value_formats_array(df['total_volume'])
+    return df
+
 def fourth_page():
     st.markdown("<h2 style='color: violet;'>PHONEPE INSURANCE DATA INSIGHTS</h1>", unsafe_allow_html=True)
     warnings.simplefilter(action='ignore', category=FutureWarning)
     st.markdown("<h3 style ='color: blue;'>Insurance Penetration and Growth Potential Analysis</h3>", unsafe_allow_html=True)
     st.markdown("\n")
 
-    query = """SELECT state, latitude, longitude, metric FROM india_level_location_metrics;"""
-    df = pd.read_sql(query, engine)
+    # Location_metrics keeps one row per location and period, all at the same coordinates, so the map
+    # takes the latest period only; clustering then sums locations, not quarters
+    query = """SELECT l.state, l.latitude, l.longitude, m.year, m.quarter, m.metric
+               FROM location_metrics AS m
+               INNER JOIN (SELECT year, quarter FROM location_metrics ORDER BY year DESC, quarter DESC LIMIT 1) AS p
+               ON m.year = p.year AND m.quarter = p.quarter
+               INNER JOIN location_dim AS l ON m.location_id = l.location_id
+               WHERE l.district = '';"""
+    df = read_sql(query, read_engine())
+    selected_zoom = st.sidebar.select_slider("Map Zoom: ", MAP_ZOOM_LEVELS, value=4)
+    center = {"lat": df['latitude'].mean(), "lon": df['longitude'].mean()}
+    south, north, west, east = map_viewport(center, selected_zoom)
+    visible = df[df['latitude'].between(south, north) & df['longitude'].between(west, east)]
+    points = cluster_points(visible, 'metric', selected_zoom, ['state'])
     with st.container(border=True):
-        fig = px.scatter_mapbox(df,
+        if len(df):
+            st.caption(f"Insurance metrics for {df['year'].iloc[0]} - {df['quarter'].iloc[0]}")
+        fig = px.scatter_mapbox(points,
             lat='latitude',
             lon='longitude',
             size='metric',
             color='metric',
             color_continuous_scale='Magma',
             hover_name='state',
-            hover_data={'latitude': True, 'longitude': True, 'metric': True},
-            zoom=4)
+            hover_data={'latitude': True, 'longitude': True, 'metric': True, 'points': True},
+            zoom=selected_zoom)
 
         fig.update_layout(mapbox_style="carto-positron",
-            mapbox_center={"lat": df['latitude'].mean(), "lon": df['longitude'].mean()},
+            mapbox_center=center,
             margin={"r":0, "t":0, "l":0, "b":0}
         )
         st.plotly_chart(fig, use_container_width=True)
@@ -1645,37 +2741,13 @@ def fourth_page():
 
     st.markdown(f"<h4 style ='color: Skyblue;'>Statewise Proiritization</h4>", unsafe_allow_html=True)
 
-    query1 = """CREATE TEMPORARY TABLE growth_rate AS
-                SELECT state, 
-                        SUM(CASE WHEN year=2024 THEN insurance_count ELSE 0 END) AS count_2024,
-                        SUM(CASE WHEN year=2023 THEN insurance_count ELSE 0 END) AS count_2023,
-                        ROUND(	(SUM(CASE WHEN year=2024 THEN insurance_count ELSE 0 END) - 
-                                SUM(CASE WHEN year=2023 THEN insurance_count ELSE 0 END) ) * 100 /
-                            NULLIF(SUM(CASE WHEN year=2023 THEN insurance_count ELSE 0 END), 0), 2) AS growth_percent 
-                FROM aggregated_insurance GROUP BY state;"""
-    query2 = """CREATE TEMPORARY TABLE volume AS
-                SELECT state, SUM(insurance_count) as total_volume
-                FROM map_insurance GROUP BY state;"""
-    query = """	SELECT g.state, g.growth_percent, v.total_volume,
-                        CASE
-                            WHEN g.growth_percent <= 20 AND v.total_volume > 100000 THEN "Saturated"
-                            WHEN g.growth_percent > 20 AND v.total_volume > 100000 THEN "Best"
-                            WHEN g.growth_percent > 20 AND v.total_volume < 100000 THEN "Rising"
-                            ELSE "Idle"
-                        END AS state_category
-                FROM growth_rate as g
-                JOIN volume as v
-                ON g.state=v.state;"""
-    
-    with engine.connect() as conn:
-        conn.execute(text(query1))
-        conn.execute(text(query2))
-        df = pd.read_sql(query, conn)
+    df = state_priority(data_version())
+    if df.empty:
+        st.info("State prioritization needs two complete years of insurance data.")
+        export_links("insurance.districts", {})
+        return
 
-    df['volume_f'] = df['total_volume'].apply(value_formats)
     with st.container(border=True):
-        df['state_category'] = pd.Categorical(df['state_category'], categories=['Best', 'Saturated', 'Rising', 'Idle'], ordered=True)
-
         #col1, col2 = st.columns([0.5,0.5])
         #with col1:
             #st.markdown("BEST - High Growth & High Volume")
@@ -1684,18 +2756,64 @@ def fourth_page():
             #st.markdown("RISING - High Growth & Low Volume")
             #st.markdown("IDLE - Low Growth & Low Volume")
         
-        fig = px.treemap(df, path=[px.Constant("States by Category"), 'state_category', 'state'],
-                        values=None,
-                        color='state_category',
-                        hover_data={'growth_percent': True, 'total_volume': True})
+        def build_treemap():
+            fig = px.treemap(df, path=[px.Constant("States by Category"), 'state_category', 'state'],
+                            values=None,
+                            color='state_category',
+                            hover_data={'growth_percent': True, 'total_volume': True})
 
-        fig.update_layout(margin=dict(t=0, b=0, l=0, r=0))
-        st.plotly_chart(fig, use_container_width=True)
+            fig.update_layout(margin=dict(t=0, b=0, l=0, r=0))
+            return fig
+
+        st.plotly_chart(cached_figure("insurance.state_priority_treemap", (), build_treemap), use_container_width=True)
 
         with st.expander("Detailed Info On State prioritization"):
             st.dataframe(df)
+    export_links("insurance.districts", {})
 
 
+# ------------------------------------------- QUERY DIAGNOSTICS ---------------------------------------------- #
+
+def query_admin_panel():
+    st.markdown("<h3 style='color: blue;'>Query Diagnostics</h3>", unsafe_allow_html=True)
+    log = query_log()
+    with log["lock"]:
+        records = list(log["records"])
+    if not records:
+        st.info("No queries recorded yet.")
+        return
+    log_df = pd.DataFrame(records)
+    threshold = st.number_input("Slow query threshold (ms)", min_value=0.0, value=SLOW_QUERY_MS, step=50.0)
+
+    col1, col2 = st.columns(2)
+    with col1.container(border=True):
+        st.markdown("<h4 style ='color: skyblue;'>Per Page Breakdown</h4>", unsafe_allow_html=True)
+        by_page = log_df.groupby('page').agg(queries=('fingerprint', 'size'),
+                                             total_ms=('ms', 'sum'),
+                                             max_ms=('ms', 'max'),
+                                             rows=('rows', 'sum'),
+                                             fetched_bytes=('fetched_bytes', 'sum'),
+                                             bytes=('bytes', 'sum'))
+        st.dataframe(by_page.sort_values('total_ms', ascending=False), use_container_width=True)
+    with col2.container(border=True):
+        st.markdown("<h4 style ='color: skyblue;'>Per Section Breakdown</h4>", unsafe_allow_html=True)
+        by_section = log_df.groupby(['page', 'section', 'fingerprint']).agg(calls=('ms', 'size'),
+                                                                           mean_ms=('ms', 'mean'),
+                                                                           max_ms=('ms', 'max'),
+                                                                           rows=('rows', 'max'),
+                                                                           fetched_bytes=('fetched_bytes', 'max'),
+                                                                           bytes=('bytes', 'max'))
+        st.dataframe(by_section.sort_values('mean_ms', ascending=False), use_container_width=True)
+
+    with st.container(border=True):
+        slow = log_df[log_df['ms'] >= threshold].sort_values('ms', ascending=False)
+        st.markdown(f"<h4 style ='color: skyblue;'>Slow Queries ({len(slow)} at or above {threshold:g} ms)</h4>", unsafe_allow_html=True)
+        st.dataframe(slow[['page', 'section', 'fingerprint', 'ms', 'rows', 'fetched_bytes', 'bytes', 'sql']], use_container_width=True, hide_index=True)
+    if st.button("Clear query log"):
+        with log["lock"]:
+            log["records"].clear()
+        st.rerun()
+
 # ------------------------------------------- MAIN FUNCTION -------------------------------------------------- #
 
 pages = {"HOME" : main_page,
@@ -1703,8 +2821,14 @@ pages = {"HOME" : main_page,
          "TRANSACTION" : third_page,
          "INSURANCE" : fourth_page}
 
-st.set_page_config(layout="wide")
+if __name__ == "__main__":
+    st.set_page_config(layout="wide")
+    data_version()
+
+    selected_page = st.sidebar.radio("Phonepe Pulse Insights", list(pages.keys()))
 
-selected_page = st.sidebar.radio("Phonepe Pulse Insights", list(pages.keys()))
+    with page_profile(selected_page):
+        pages[selected_page]()
 
-pages[selected_page]()
+    if ADMIN_PANEL and st.sidebar.toggle("Query diagnostics"):
+        query_admin_panel()